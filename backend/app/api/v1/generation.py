@@ -1,27 +1,92 @@
 from __future__ import annotations
 
 import asyncio
+import base64
+import time
+from dataclasses import dataclass
+from typing import Any
 
-from fastapi import APIRouter, HTTPException
+from fastapi import APIRouter, Header, HTTPException
 
 from app.models.schemas import (
     GenerateScriptRequest,
     GenerateScriptResponse,
+    GenerateSuiteRequest,
+    GenerateSuiteResponse,
     ResponseMetadata,
+    SuiteFile,
+    SuitePage,
 )
+from app.services.generation_cache import GenerationCache, canonical_request_key
 from app.services.llm_client import OpenAICompatibleLLMClient
-from app.services.prompt_builder import build_generation_messages
+from app.services.model_ladder import (
+    LadderResult,
+    ValidateFn,
+    generate_with_model_ladder,
+    merge_usage,
+    resolve_model_ladder,
+)
+from app.services.prompt_builder import (
+    build_generation_messages,
+    build_suite_conftest_messages,
+    build_suite_page_messages,
+)
 from app.services.script_validator import (
     ScriptValidationError,
-    extract_test_name,
-    validate_and_extract_script,
+    validate_and_extract_script_with_name,
+)
+from app.services.suite_builder import (
+    build_suite_archive,
+    check_suite,
+    module_name_for_page,
+    suite_directory_name,
+    suite_module_validator,
+    validate_conftest,
+)
+from app.services.tenant_scheduler import (
+    DeadlineExceededError,
+    QuotaExceededError,
+    SPECULATIVE_TENANT,
+    TenantScheduler,
+    extract_estimated_tokens,
 )
+from app.services.traffic_capture import CaptureSession, TrafficRecorder
+
+# Status recorded for captured requests whose client went away (nginx convention).
+CLIENT_CLOSED_REQUEST_STATUS = 499
 
 router = APIRouter()
 llm_client = OpenAICompatibleLLMClient.from_env()
+tenant_scheduler = TenantScheduler.from_env()
+traffic_recorder = TrafficRecorder.from_env()
+generation_cache = GenerationCache.from_env()
+
+
+@dataclass
+class SpeculativeRun:
+    """Scheduler state of one prefetch, shared with a generate call that adopts it."""
 
+    queue_tenant: str = SPECULATIVE_TENANT
+    holding_slot: bool = False
 
-def resolve_generation_timeout_seconds(request: GenerateScriptRequest) -> float:
+
+speculative_runs: dict[str, SpeculativeRun] = {}
+
+
+def resolve_request_tenant(
+    x_tenant_id: str | None,
+    x_api_key: str | None,
+    authorization: str | None,
+) -> str:
+    api_key = x_api_key
+    if not api_key and authorization and authorization.lower().startswith("bearer "):
+        api_key = authorization[7:].strip()
+    return tenant_scheduler.resolve_tenant(api_key=api_key, tenant_header=x_tenant_id)
+
+
+def resolve_generation_timeout_seconds(
+    request: GenerateScriptRequest | GenerateSuiteRequest,
+) -> float:
     timeout_ms = request.generation_options.timeout_ms
     if timeout_ms is not None:
         if timeout_ms <= 0:
@@ -32,39 +97,82 @@ def resolve_generation_timeout_seconds(request: GenerateScriptRequest) -> float:
     return max(float(timeout_seconds), 0.1)
 
 
-@router.post("/scripts/playwright-python", response_model=GenerateScriptResponse)
-async def generate_playwright_python_script(
-    request: GenerateScriptRequest,
-) -> GenerateScriptResponse:
-    if request.generation_options.style != "pytest_sync":
-        raise HTTPException(status_code=422, detail="Only pytest_sync style is supported")
+def check_tenant_quota(tenant: str) -> None:
+    try:
+        tenant_scheduler.check_quota(tenant)
+    except QuotaExceededError as error:
+        raise HTTPException(
+            status_code=429,
+            detail=str(error),
+            headers={"Retry-After": str(max(int(error.retry_after_seconds + 0.999), 1))},
+        ) from error
 
-    messages = build_generation_messages(
-        page_url=str(request.page_url),
-        output_markdown=request.output_markdown,
-        annotations=[a.model_dump() for a in request.annotations],
-    )
-    timeout_seconds = resolve_generation_timeout_seconds(request)
+
+def _served_from_cache(response: GenerateScriptResponse) -> GenerateScriptResponse:
+    cached = response.model_copy(deep=True)
+    cached.metadata.warnings.append("served from generation cache")
+    return cached
+
+
+async def _run_generation(
+    messages: list[dict[str, str]],
+    *,
+    tenant: str,
+    queue_tenant: str,
+    requested_model: str | None,
+    temperature: float | None,
+    deadline: float,
+    capture: CaptureSession | None,
+    validate: ValidateFn = validate_and_extract_script_with_name,
+    min_assertions: int | None = None,
+    speculation: SpeculativeRun | None = None,
+) -> LadderResult:
+    models = resolve_model_ladder(getattr(llm_client, "model_ladder", ()), requested_model)
+    if min_assertions is None:
+        min_assertions = getattr(llm_client, "ladder_min_assertions", 1)
+    timeout_seconds = max(deadline - tenant_scheduler.now(), 0.0)
+
+    async def generate(model: str | None):
+        slot_tenant = speculation.queue_tenant if speculation is not None else queue_tenant
+        async with tenant_scheduler.slot(slot_tenant, deadline=deadline, service_key=model):
+            if speculation is not None:
+                speculation.holding_slot = True
+            started_at = time.monotonic()
+            try:
+                generation_result = await llm_client.generate_script(
+                    messages=messages,
+                    model=model,
+                    temperature=temperature,
+                    timeout_seconds=deadline - tenant_scheduler.now(),
+                )
+            finally:
+                if speculation is not None:
+                    speculation.holding_slot = False
+        if capture is not None:
+            capture.add_upstream(
+                requested_model=model,
+                generation_result=generation_result,
+                duration_seconds=time.monotonic() - started_at,
+            )
+        if isinstance(generation_result, tuple):
+            usage = generation_result[1]
+            tenant_scheduler.record_usage(
+                tenant, usage, estimated_tokens=extract_estimated_tokens(usage)
+            )
+        return generation_result
 
     try:
-        generation_result = await asyncio.wait_for(
-            llm_client.generate_script(
-                messages=messages,
-                model=request.model,
-                temperature=request.temperature,
+        return await asyncio.wait_for(
+            generate_with_model_ladder(
+                generate,
+                models,
+                min_assertions=min_assertions,
+                validate=validate,
             ),
             timeout=timeout_seconds,
         )
-
-        if isinstance(generation_result, tuple):
-            raw_script, token_usage, model_name = generation_result
-        else:
-            raw_script = generation_result
-            token_usage = None
-            model_name = request.model or "unknown"
-
-        script = validate_and_extract_script(raw_script)
-        test_name = extract_test_name(script)
+    except DeadlineExceededError as error:
+        raise HTTPException(status_code=504, detail=str(error)) from error
     except TimeoutError as error:
         raise HTTPException(
             status_code=504,
@@ -75,12 +183,333 @@ async def generate_playwright_python_script(
     except Exception as error:  # pragma: no cover - external transport errors
         raise HTTPException(status_code=502, detail=f"LLM generation failed: {error}") from error
 
+
+def _build_messages(request: GenerateScriptRequest) -> list[dict[str, str]]:
+    return build_generation_messages(
+        page_url=str(request.page_url),
+        output_markdown=request.output_markdown,
+        annotations=[a.model_dump() for a in request.annotations],
+    )
+
+
+def _request_cache_key(
+    request: GenerateScriptRequest, messages: list[dict[str, str]], tenant: str
+) -> str:
+    return canonical_request_key(
+        messages, tenant=tenant, model=request.model, temperature=request.temperature
+    )
+
+
+async def _generate_response(
+    request: GenerateScriptRequest,
+    messages: list[dict[str, str]],
+    tenant: str,
+    *,
+    queue_tenant: str,
+    deadline: float,
+    capture: CaptureSession | None,
+    speculation: SpeculativeRun | None = None,
+) -> GenerateScriptResponse:
+    ladder_result = await _run_generation(
+        messages,
+        tenant=tenant,
+        queue_tenant=queue_tenant,
+        requested_model=request.model,
+        temperature=request.temperature,
+        deadline=deadline,
+        capture=capture,
+        speculation=speculation,
+    )
+
     return GenerateScriptResponse(
-        script=script,
-        test_name=test_name,
+        script=ladder_result.script,
+        test_name=ladder_result.test_name,
+        metadata=ResponseMetadata(
+            model=ladder_result.model,
+            warnings=ladder_result.warnings,
+            token_usage=ladder_result.token_usage,
+        ),
+    )
+
+
+async def _adopt_speculation(
+    cache_key: str, tenant: str, deadline: float
+) -> GenerateScriptResponse | None:
+    """Reuse the in-flight prefetch for ``cache_key`` within the caller's budget.
+
+    A prefetch still waiting for a slot is cancelled so the caller queues at its
+    own priority instead of the speculative tenant's. One already talking to the
+    model is moved to the caller's tenant for any later ladder rungs and awaited
+    for at most the remaining budget.
+    """
+    task = generation_cache.in_flight(cache_key)
+    speculation = speculative_runs.get(cache_key)
+    if task is None or speculation is None:
+        return None
+    if not speculation.holding_slot:
+        task.cancel()
+        return None
+
+    speculation.queue_tenant = tenant
+    await asyncio.wait({task}, timeout=max(deadline - tenant_scheduler.now(), 0.0))
+    return generation_cache.take(cache_key)
+
+
+@router.post("/scripts/playwright-python", response_model=GenerateScriptResponse)
+async def generate_playwright_python_script(
+    request: GenerateScriptRequest,
+    x_tenant_id: str | None = Header(default=None),
+    x_api_key: str | None = Header(default=None),
+    authorization: str | None = Header(default=None),
+) -> GenerateScriptResponse:
+    if request.generation_options.style != "pytest_sync":
+        raise HTTPException(status_code=422, detail="Only pytest_sync style is supported")
+
+    deadline = tenant_scheduler.now() + resolve_generation_timeout_seconds(request)
+    tenant = resolve_request_tenant(x_tenant_id, x_api_key, authorization)
+    messages = _build_messages(request)
+    cache_key = _request_cache_key(request, messages, tenant)
+    capture = (
+        traffic_recorder.start(request.model_dump(mode="json"), tenant=tenant)
+        if traffic_recorder.enabled
+        else None
+    )
+
+    status_code = 200
+    try:
+        prefetched = generation_cache.take(cache_key)
+        if prefetched is None:
+            prefetched = await _adopt_speculation(cache_key, tenant, deadline)
+        if prefetched is not None:
+            return _served_from_cache(prefetched)
+
+        check_tenant_quota(tenant)
+        return await _generate_response(
+            request,
+            messages,
+            tenant,
+            queue_tenant=tenant,
+            deadline=deadline,
+            capture=capture,
+        )
+    except HTTPException as error:
+        status_code = error.status_code
+        raise
+    except asyncio.CancelledError:
+        status_code = CLIENT_CLOSED_REQUEST_STATUS
+        raise
+    except Exception:
+        status_code = 500
+        raise
+    finally:
+        if capture is not None:
+            capture.finish(status_code)
+
+
+@router.post("/scripts/playwright-python/prefetch", status_code=202)
+async def prefetch_playwright_python_script(
+    request: GenerateScriptRequest,
+    x_tenant_id: str | None = Header(default=None),
+    x_api_key: str | None = Header(default=None),
+    authorization: str | None = Header(default=None),
+) -> dict[str, str]:
+    """Speculatively generate a script so the final generate call hits the cache.
+
+    Runs in the background on the low-weight speculative scheduler tenant; a
+    newer prefetch for the same tenant and page cancels the superseded one.
+    """
+    if request.generation_options.style != "pytest_sync":
+        raise HTTPException(status_code=422, detail="Only pytest_sync style is supported")
+
+    tenant = resolve_request_tenant(x_tenant_id, x_api_key, authorization)
+    check_tenant_quota(tenant)
+    messages = _build_messages(request)
+    cache_key = _request_cache_key(request, messages, tenant)
+    speculation = SpeculativeRun()
+    status = generation_cache.start_speculative(
+        cache_key,
+        f"{tenant}|{request.page_url}",
+        lambda: _generate_response(
+            request,
+            messages,
+            tenant,
+            queue_tenant=SPECULATIVE_TENANT,
+            deadline=tenant_scheduler.now() + resolve_generation_timeout_seconds(request),
+            capture=None,
+            speculation=speculation,
+        ),
+    )
+    if status == "started":
+        speculative_runs[cache_key] = speculation
+
+        def forget_run(task: asyncio.Task[Any]) -> None:
+            if speculative_runs.get(cache_key) is speculation:
+                del speculative_runs[cache_key]
+
+        generation_cache.in_flight(cache_key).add_done_callback(forget_run)
+    return {"status": status, "key": cache_key}
+
+
+async def _generate_suite_page(
+    request: GenerateSuiteRequest,
+    page: SuitePage,
+    module_name: str,
+    conftest_source: str,
+    *,
+    tenant: str,
+    deadline: float,
+    validate: ValidateFn,
+) -> LadderResult:
+    messages = build_suite_page_messages(
+        page_url=str(page.page_url),
+        output_markdown=page.output_markdown,
+        annotations=[a.model_dump() for a in page.annotations],
+        conftest_source=conftest_source,
+        module_name=module_name,
+    )
+    try:
+        return await _run_generation(
+            messages,
+            tenant=tenant,
+            queue_tenant=tenant,
+            requested_model=request.model,
+            temperature=request.temperature,
+            deadline=deadline,
+            capture=None,
+            validate=validate,
+        )
+    except HTTPException as error:
+        raise HTTPException(
+            status_code=error.status_code,
+            detail=f"{module_name}.py ({page.page_url}): {error.detail}",
+        ) from error
+
+
+async def _gather_or_cancel(coroutines: list[Any]) -> list[Any]:
+    """Like ``asyncio.gather`` but cancels the siblings once one call fails."""
+    tasks = [asyncio.ensure_future(coroutine) for coroutine in coroutines]
+    try:
+        return await asyncio.gather(*tasks)
+    finally:
+        for task in tasks:
+            task.cancel()
+
+
+@router.post("/scripts/playwright-python/suite", response_model=GenerateSuiteResponse)
+async def generate_playwright_python_suite(
+    request: GenerateSuiteRequest,
+    x_tenant_id: str | None = Header(default=None),
+    x_api_key: str | None = Header(default=None),
+    authorization: str | None = Header(default=None),
+) -> GenerateSuiteResponse:
+    """Generate a multi-page suite: one shared conftest.py, then every page in parallel.
+
+    All calls share one deadline, so the whole suite takes roughly the conftest
+    call plus the slowest page rather than the sum of all pages.
+    """
+    if request.generation_options.style != "pytest_sync":
+        raise HTTPException(status_code=422, detail="Only pytest_sync style is supported")
+
+    tenant = resolve_request_tenant(x_tenant_id, x_api_key, authorization)
+    check_tenant_quota(tenant)
+    deadline = tenant_scheduler.now() + resolve_generation_timeout_seconds(request)
+
+    used_names: set[str] = set()
+    module_names = [module_name_for_page(str(page.page_url), used_names) for page in request.pages]
+    conftest_messages = build_suite_conftest_messages(
+        [
+            {
+                "module_name": module_name,
+                "page_url": str(page.page_url),
+                "output_markdown": page.output_markdown,
+                "annotations": [a.model_dump() for a in page.annotations],
+            }
+            for module_name, page in zip(module_names, request.pages)
+        ]
+    )
+    try:
+        conftest = await _run_generation(
+            conftest_messages,
+            tenant=tenant,
+            queue_tenant=tenant,
+            requested_model=request.model,
+            temperature=request.temperature,
+            deadline=deadline,
+            capture=None,
+            validate=validate_conftest,
+            min_assertions=0,
+        )
+    except HTTPException as error:
+        raise HTTPException(
+            status_code=error.status_code, detail=f"conftest.py: {error.detail}"
+        ) from error
+
+    validate_page = suite_module_validator(conftest.script)
+    pages = await _gather_or_cancel(
+        [
+            _generate_suite_page(
+                request,
+                page,
+                module_name,
+                conftest.script,
+                tenant=tenant,
+                deadline=deadline,
+                validate=validate_page,
+            )
+            for module_name, page in zip(module_names, request.pages)
+        ]
+    )
+
+    modules = {module_name: page.script for module_name, page in zip(module_names, pages)}
+    sources = {"conftest.py": conftest.script}
+    sources.update({f"{module_name}.py": source for module_name, source in modules.items()})
+    directory = suite_directory_name(request.suite_name)
+    archive = build_suite_archive(directory, sources)
+
+    files = [SuiteFile(path=f"{directory}/conftest.py", model=conftest.model)]
+    warnings = [f"conftest.py: {warning}" for warning in conftest.warnings]
+    token_usage = conftest.token_usage
+    for module_name, page, result in zip(module_names, request.pages, pages):
+        files.append(
+            SuiteFile(
+                path=f"{directory}/{module_name}.py",
+                model=result.model,
+                page_url=str(page.page_url),
+                test_name=result.test_name,
+            )
+        )
+        warnings.extend(f"{module_name}.py: {warning}" for warning in result.warnings)
+        token_usage = merge_usage(token_usage, result.token_usage)
+    warnings.extend(check_suite(modules))
+
+    models = list(dict.fromkeys(file.model for file in files))
+    return GenerateSuiteResponse(
+        archive_base64=base64.b64encode(archive).decode("ascii"),
+        files=files,
         metadata=ResponseMetadata(
-            model=model_name,
-            warnings=[],
+            model=", ".join(models),
+            warnings=warnings,
             token_usage=token_usage,
         ),
     )
+
+
+@router.get("/scripts/playwright-python/cache")
+async def get_generation_cache_stats() -> dict[str, int]:
+    return generation_cache.stats()
+
+
+@router.get("/scripts/playwright-python/metrics")
+async def get_generation_metrics() -> dict[str, Any]:
+    early_stop_stats = getattr(llm_client, "early_stop_stats", None)
+    return {
+        "early_stop": early_stop_stats.snapshot() if early_stop_stats is not None else None,
+    }
+
+
+@router.get("/tenants/usage")
+async def get_tenant_usage() -> dict[str, Any]:
+    return {
+        "max_concurrency": tenant_scheduler.max_concurrency,
+        "tenants": tenant_scheduler.usage_snapshot(),
+    }
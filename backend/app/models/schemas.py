@@ -42,3 +42,30 @@ class GenerateScriptResponse(BaseModel):
     script: str
     test_name: str
     metadata: ResponseMetadata
+
+
+class SuitePage(BaseModel):
+    page_url: HttpUrl
+    output_markdown: str = ""
+    annotations: list[AnnotationPayload] = Field(default_factory=list)
+
+
+class GenerateSuiteRequest(BaseModel):
+    suite_name: str = "playwright_suite"
+    pages: list[SuitePage] = Field(min_length=1)
+    generation_options: GenerationOptions = Field(default_factory=GenerationOptions)
+    model: str | None = None
+    temperature: float | None = None
+
+
+class SuiteFile(BaseModel):
+    path: str
+    model: str
+    page_url: str | None = None
+    test_name: str | None = None
+
+
+class GenerateSuiteResponse(BaseModel):
+    archive_base64: str
+    files: list[SuiteFile]
+    metadata: ResponseMetadata
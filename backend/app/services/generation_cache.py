@@ -0,0 +1,162 @@
+from __future__ import annotations
+
+import asyncio
+import hashlib
+import json
+import os
+import time
+from collections import OrderedDict
+from collections.abc import Awaitable, Callable
+from typing import Any
+
+from app.config import load_env_file
+
+
+def canonical_request_key(
+    messages: list[dict[str, str]],
+    *,
+    tenant: str,
+    model: str | None,
+    temperature: float | None,
+) -> str:
+    """Hash exactly what is sent upstream: the built messages plus model settings."""
+    payload = {
+        "tenant": tenant,
+        "messages": messages,
+        "model": model,
+        "temperature": temperature,
+    }
+    encoded = json.dumps(payload, ensure_ascii=True, sort_keys=True).encode("utf-8")
+    return hashlib.sha256(encoded).hexdigest()
+
+
+class GenerationCache:
+    """TTL/LRU cache of speculative generation results and their tasks.
+
+    Entries are single-use: the generate call that consumes one removes it with
+    ``take``, so pressing "Generate" again always reaches the model.
+
+    Speculative work is tracked per ``slot`` (tenant and page): starting a new
+    speculation for a slot cancels the superseded one, and at most
+    ``max_speculative`` speculations run at once.
+    """
+
+    def __init__(
+        self,
+        *,
+        ttl_seconds: float = 300.0,
+        max_entries: int = 256,
+        max_speculative: int = 2,
+        clock: Callable[[], float] = time.monotonic,
+    ) -> None:
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max(int(max_entries), 1)
+        self.max_speculative = max(int(max_speculative), 0)
+        self._clock = clock
+        self._entries: OrderedDict[str, tuple[float, Any]] = OrderedDict()
+        self._tasks: dict[str, asyncio.Task[Any]] = {}
+        self._slots: dict[str, str] = {}
+        self._stats = {
+            "hits": 0,
+            "misses": 0,
+            "speculative_started": 0,
+            "speculative_superseded": 0,
+            "speculative_skipped": 0,
+            "speculative_failed": 0,
+        }
+
+    @classmethod
+    def from_env(cls) -> "GenerationCache":
+        load_env_file(override_existing=True)
+        return cls(
+            ttl_seconds=float(os.getenv("GENERATION_CACHE_TTL", "300")),
+            max_entries=int(os.getenv("GENERATION_CACHE_MAX_ENTRIES", "256")),
+            max_speculative=int(os.getenv("SPECULATIVE_MAX_CONCURRENCY", "2")),
+        )
+
+    def get(self, key: str) -> Any | None:
+        entry = self._entries.get(key)
+        if entry is None or entry[0] <= self._clock():
+            self._entries.pop(key, None)
+            self._stats["misses"] += 1
+            return None
+        self._entries.move_to_end(key)
+        self._stats["hits"] += 1
+        return entry[1]
+
+    def take(self, key: str) -> Any | None:
+        """Return and remove the entry for ``key``."""
+        value = self.get(key)
+        self._entries.pop(key, None)
+        return value
+
+    def put(self, key: str, value: Any) -> None:
+        self._entries[key] = (self._clock() + self.ttl_seconds, value)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def in_flight(self, key: str) -> asyncio.Task[Any] | None:
+        return self._tasks.get(key)
+
+    def start_speculative(
+        self,
+        key: str,
+        slot: str,
+        generate: Callable[[], Awaitable[Any]],
+    ) -> str:
+        """Start ``generate`` in the background and cache its result under ``key``.
+
+        Returns ``"cached"``, ``"in_flight"``, ``"skipped"`` (capacity cap
+        reached) or ``"started"``.
+        """
+        if key in self._entries and self._entries[key][0] > self._clock():
+            return "cached"
+        if key in self._tasks:
+            self._slots[slot] = key
+            return "in_flight"
+
+        superseded_key = self._slots.get(slot)
+        superseded = self._tasks.get(superseded_key) if superseded_key else None
+        if superseded is not None:
+            superseded.cancel()
+            self._forget(superseded_key)
+            self._stats["speculative_superseded"] += 1
+
+        if len(self._tasks) >= self.max_speculative:
+            self._stats["speculative_skipped"] += 1
+            return "skipped"
+
+        self._tasks[key] = asyncio.create_task(self._run_speculative(key, generate))
+        self._slots[slot] = key
+        self._stats["speculative_started"] += 1
+        return "started"
+
+    async def _run_speculative(self, key: str, generate: Callable[[], Awaitable[Any]]) -> Any:
+        try:
+            result = await generate()
+        except asyncio.CancelledError:
+            raise
+        except Exception:
+            self._stats["speculative_failed"] += 1
+            return None
+        finally:
+            if self._tasks.get(key) is asyncio.current_task():
+                self._forget(key)
+        self.put(key, result)
+        return result
+
+    def _forget(self, key: str | None) -> None:
+        if key is None:
+            return
+        self._tasks.pop(key, None)
+        for slot, slot_key in list(self._slots.items()):
+            if slot_key == key:
+                del self._slots[slot]
+
+    def stats(self) -> dict[str, int]:
+        return {
+            **self._stats,
+            "entries": len(self._entries),
+            "speculative_in_flight": len(self._tasks),
+        }
@@ -2,6 +2,8 @@ from __future__ import annotations
 
 import asyncio
 import os
+import threading
+import time
 from dataclasses import dataclass
 import json
 from typing import Any
@@ -20,17 +22,124 @@ class LLMConfig:
     api_key: str
     model: str
     timeout_seconds: float = 60.0
+    model_ladder: tuple[str, ...] = ()
+    ladder_min_assertions: int = 1
+    early_stop: bool = False
+    early_stop_calibration_every: int = 20
+    max_output_tokens: int | None = None
+    stop_sequences: tuple[str, ...] = ()
+
+
+DEFAULT_TOKENS_PER_CHAR = 0.25
+EARLY_STOP_EWMA_ALPHA = 0.2
+
+
+def _closing_fence_end(text: str) -> int | None:
+    """Index just past the fence that closes the first code block, if it has arrived."""
+    opening = text.find("```")
+    if opening == -1:
+        return None
+    closing = text.find("```", opening + 3)
+    return None if closing == -1 else closing + 3
+
+
+def _event_field(event: Any, name: str) -> Any:
+    if isinstance(event, dict):
+        return event.get(name)
+    return getattr(event, name, None)
+
+
+class EarlyStopStats:
+    """Counts streams cut at the closing code fence and estimates what that saved.
+
+    Savings cannot be observed on a stream that was cut, so every
+    ``calibration_every``-th stream runs to completion and the output it
+    produced after the closing fence feeds the per-stop estimate.
+    """
+
+    def __init__(self, calibration_every: int = 20) -> None:
+        self.calibration_every = max(int(calibration_every), 0)
+        self._lock = threading.Lock()
+        self._streams = 0
+        self.early_stops = 0
+        self.calibration_samples = 0
+        self.trailing_chars: float | None = None
+        self.trailing_ms: float | None = None
+        self.tokens_per_char: float | None = None
+        self.estimated_tokens_saved = 0.0
+        self.estimated_ms_saved = 0.0
+
+    @staticmethod
+    def _ewma(current: float | None, sample: float) -> float:
+        if current is None:
+            return sample
+        return current + EARLY_STOP_EWMA_ALPHA * (sample - current)
+
+    def next_stream_is_calibration(self) -> bool:
+        with self._lock:
+            self._streams += 1
+            return self.calibration_every > 0 and self._streams % self.calibration_every == 0
+
+    def estimate_tokens(self, chars: int) -> int:
+        return int(round(chars * (self.tokens_per_char or DEFAULT_TOKENS_PER_CHAR)))
+
+    def record_calibration(
+        self, *, trailing_chars: int, trailing_ms: float, output_chars: int, output_tokens: int
+    ) -> None:
+        with self._lock:
+            self.calibration_samples += 1
+            self.trailing_chars = self._ewma(self.trailing_chars, trailing_chars)
+            self.trailing_ms = self._ewma(self.trailing_ms, trailing_ms)
+            if output_chars and output_tokens:
+                self.tokens_per_char = self._ewma(
+                    self.tokens_per_char, output_tokens / output_chars
+                )
+
+    def record_early_stop(self) -> dict[str, Any]:
+        with self._lock:
+            self.early_stops += 1
+            tokens_saved = self.estimate_tokens(int(self.trailing_chars or 0))
+            ms_saved = round(self.trailing_ms or 0.0, 3)
+            self.estimated_tokens_saved += tokens_saved
+            self.estimated_ms_saved += ms_saved
+        return {
+            "stopped": True,
+            "estimated_tokens_saved": tokens_saved,
+            "estimated_ms_saved": ms_saved,
+            "calibrated": self.calibration_samples > 0,
+        }
+
+    def snapshot(self) -> dict[str, Any]:
+        with self._lock:
+            return {
+                "streams": self._streams,
+                "early_stops": self.early_stops,
+                "calibration_samples": self.calibration_samples,
+                "estimated_tokens_saved": int(round(self.estimated_tokens_saved)),
+                "estimated_ms_saved": round(self.estimated_ms_saved, 3),
+                "trailing_chars_per_response": self.trailing_chars,
+                "trailing_ms_per_response": self.trailing_ms,
+            }
 
 
 class OpenAICompatibleLLMClient:
     def __init__(self, config: LLMConfig) -> None:
         self._config = config
         self._client = None
+        self.early_stop_stats = EarlyStopStats(config.early_stop_calibration_every)
 
     @property
     def timeout_seconds(self) -> float:
         return self._config.timeout_seconds
 
+    @property
+    def model_ladder(self) -> tuple[str, ...]:
+        return self._config.model_ladder
+
+    @property
+    def ladder_min_assertions(self) -> int:
+        return self._config.ladder_min_assertions
+
     @classmethod
     def from_env(cls) -> "OpenAICompatibleLLMClient":
         load_env_file(override_existing=True)
@@ -38,6 +147,20 @@ class OpenAICompatibleLLMClient:
         api_key = os.getenv("LLM_API_KEY") or os.getenv("DASHSCOPE_API_KEY", "")
         model = os.getenv("LLM_MODEL", "gpt-4.1-mini")
         timeout_seconds = float(os.getenv("LLM_TIMEOUT", "60"))
+        model_ladder = tuple(
+            name.strip()
+            for name in os.getenv("LLM_MODEL_LADDER", "").split(",")
+            if name.strip()
+        )
+        ladder_min_assertions = int(os.getenv("LLM_LADDER_MIN_ASSERTIONS", "1"))
+        early_stop = os.getenv("LLM_EARLY_STOP", "0").strip().lower() in {"1", "true", "yes", "on"}
+        calibration_every = int(os.getenv("LLM_EARLY_STOP_CALIBRATION_EVERY", "20"))
+        max_output_tokens = os.getenv("LLM_MAX_OUTPUT_TOKENS")
+        stop_sequences = tuple(
+            sequence.encode("utf-8").decode("unicode_escape")
+            for sequence in os.getenv("LLM_STOP_SEQUENCES", "").split(",")
+            if sequence
+        )
 
         return cls(
             LLMConfig(
@@ -45,6 +168,12 @@ class OpenAICompatibleLLMClient:
                 api_key=api_key,
                 model=model,
                 timeout_seconds=timeout_seconds,
+                model_ladder=model_ladder,
+                ladder_min_assertions=ladder_min_assertions,
+                early_stop=early_stop,
+                early_stop_calibration_every=calibration_every,
+                max_output_tokens=int(max_output_tokens) if max_output_tokens else None,
+                stop_sequences=stop_sequences,
             )
         )
 
@@ -53,24 +182,129 @@ class OpenAICompatibleLLMClient:
         messages: list[dict[str, str]],
         model: str | None,
         temperature: float | None,
+        timeout_seconds: float | None = None,
     ) -> tuple[str, dict[str, Any] | None, str]:
         resolved_model = model or self._config.model
         input_text = self._build_responses_input(messages)
         request_temperature = 0.2 if temperature is None else temperature
         client = self._get_client()
 
-        response = await asyncio.to_thread(
-            client.responses.create,
-            model=resolved_model,
-            input=input_text,
-            temperature=request_temperature,
-        )
+        request_kwargs: dict[str, Any] = {
+            "model": resolved_model,
+            "input": input_text,
+            "temperature": request_temperature,
+        }
+        if timeout_seconds is not None:
+            request_kwargs["timeout"] = max(min(timeout_seconds, self._config.timeout_seconds), 0.1)
+        if self._config.max_output_tokens:
+            request_kwargs["max_output_tokens"] = self._config.max_output_tokens
+        if self._config.stop_sequences:
+            # The Responses API has no stop parameter; compatible gateways that
+            # accept one (e.g. DashScope) read it from the request body.
+            request_kwargs["extra_body"] = {"stop": list(self._config.stop_sequences)}
+
+        if self._config.early_stop:
+            request_kwargs["stream"] = True
+            content, usage, model_name = await asyncio.to_thread(
+                self._create_streamed, client, request_kwargs
+            )
+            return content, usage, model_name or resolved_model
+
+        response = await asyncio.to_thread(client.responses.create, **request_kwargs)
 
         content = self._extract_responses_content(response)
         usage = self._extract_usage(response)
         model_name = getattr(response, "model", None) or resolved_model
         return content, usage, model_name
 
+    def _create_streamed(
+        self, client: Any, request_kwargs: dict[str, Any]
+    ) -> tuple[str, dict[str, Any] | None, str | None]:
+        """Stream a response and close it once the first code block is complete.
+
+        Everything after the closing fence is discarded by
+        ``_unwrap_code_fence`` anyway, so closing the stream there cancels the
+        upstream generation without changing the extracted script.
+        """
+        stats = self.early_stop_stats
+        calibrate = stats.next_stream_is_calibration()
+        stream = client.responses.create(**request_kwargs)
+        if not hasattr(stream, "__next__"):
+            # Gateways that ignore ``stream`` return the final response directly.
+            return (
+                self._extract_responses_content(stream),
+                self._extract_usage(stream),
+                getattr(stream, "model", None),
+            )
+
+        buffer = ""
+        model_name: str | None = None
+        fence_end: int | None = None
+        fence_closed_at: float | None = None
+        completed: Any = None
+        stopped_early = False
+        try:
+            for event in stream:
+                event_type = _event_field(event, "type")
+                if event_type == "response.output_text.delta":
+                    delta = _event_field(event, "delta") or ""
+                    buffer += delta
+                    if fence_end is None and "`" in delta:
+                        fence_end = _closing_fence_end(buffer)
+                        if fence_end is not None:
+                            fence_closed_at = time.monotonic()
+                            if not calibrate:
+                                stopped_early = True
+                                break
+                elif event_type == "response.created":
+                    model_name = _event_field(_event_field(event, "response"), "model")
+                elif event_type in {"response.completed", "response.incomplete"}:
+                    completed = _event_field(event, "response")
+                elif event_type in {"response.failed", "error"}:
+                    response = _event_field(event, "response")
+                    error = _event_field(response, "error") if response is not None else event
+                    message = _event_field(error, "message") or "upstream stream failed"
+                    raise RuntimeError(message)
+        finally:
+            close = getattr(stream, "close", None)
+            if callable(close):
+                close()
+
+        if stopped_early:
+            # A cut stream reports no usage. The character-based estimate is kept
+            # under its own key so it is never billed or debited as real usage.
+            script = buffer[:fence_end]
+            input_tokens = stats.estimate_tokens(len(str(request_kwargs.get("input", ""))))
+            output_tokens = stats.estimate_tokens(len(script))
+            usage = {
+                "estimated": {
+                    "input_tokens": input_tokens,
+                    "output_tokens": output_tokens,
+                    "total_tokens": input_tokens + output_tokens,
+                },
+                "early_stop": stats.record_early_stop(),
+            }
+            return script, usage, model_name
+
+        if completed is None:
+            if not buffer.strip():
+                raise ValueError("LLM stream ended without output text")
+            return buffer.strip(), None, model_name
+
+        usage = self._extract_usage(completed)
+        if fence_end is not None and fence_closed_at is not None:
+            stats.record_calibration(
+                trailing_chars=len(buffer) - fence_end,
+                trailing_ms=(time.monotonic() - fence_closed_at) * 1000,
+                output_chars=len(buffer),
+                output_tokens=int((usage or {}).get("output_tokens") or 0),
+            )
+        return (
+            self._extract_responses_content(completed),
+            usage,
+            _event_field(completed, "model") or model_name,
+        )
+
     def _get_client(self):
         if self._client is not None:
             return self._client
@@ -121,18 +355,19 @@ class OpenAICompatibleLLMClient:
 
     @staticmethod
     def _normalize_text(value: Any) -> str | None:
+        # Plain containers are checked first: after a single model_dump() the
+        # whole tree is dicts and lists, and hasattr() misses are comparatively slow.
         if isinstance(value, str):
             normalized = value.strip()
             return normalized or None
         if value is None:
             return None
-        if hasattr(value, "model_dump"):
-            return OpenAICompatibleLLMClient._normalize_text(value.model_dump())
-        if hasattr(value, "__dict__"):
-            return OpenAICompatibleLLMClient._normalize_text(value.__dict__)
         if isinstance(value, dict):
             for key in ("text", "value", "content", "refusal", "summary", "message"):
-                nested = OpenAICompatibleLLMClient._normalize_text(value.get(key))
+                nested = value.get(key)
+                if nested is None:
+                    continue
+                nested = OpenAICompatibleLLMClient._normalize_text(nested)
                 if nested:
                     return nested
             return None
@@ -145,6 +380,10 @@ class OpenAICompatibleLLMClient:
             if parts:
                 return "\n".join(parts).strip()
             return None
+        if hasattr(value, "model_dump"):
+            return OpenAICompatibleLLMClient._normalize_text(value.model_dump())
+        if hasattr(value, "__dict__"):
+            return OpenAICompatibleLLMClient._normalize_text(value.__dict__)
         return None
 
     @staticmethod
@@ -155,19 +394,24 @@ class OpenAICompatibleLLMClient:
         if output_text:
             return output_text
 
-        output_items = OpenAICompatibleLLMClient._normalize_text(
-            getattr(response, "output", None)
-        )
-        if output_items:
-            return output_items
-
-        data = (
-            response.model_dump()
-            if hasattr(response, "model_dump")
-            else response
-            if isinstance(response, dict)
-            else None
-        )
+        # Dump SDK objects once and reuse the tree for every fallback below.
+        if isinstance(response, dict):
+            data: Any = response
+        elif hasattr(response, "model_dump"):
+            data = response.model_dump()
+            output_items = OpenAICompatibleLLMClient._normalize_text(
+                data.get("output") if isinstance(data, dict) else None
+            )
+            if output_items:
+                return output_items
+        else:
+            output_items = OpenAICompatibleLLMClient._normalize_text(
+                getattr(response, "output", None)
+            )
+            if output_items:
+                return output_items
+            data = None
+
         if not isinstance(data, dict):
             raise ValueError("LLM response missing output text")
 
@@ -0,0 +1,150 @@
+from __future__ import annotations
+
+from collections.abc import Awaitable, Callable
+from dataclasses import dataclass, field
+from typing import Any
+
+from app.services.script_validator import (
+    ScriptValidationError,
+    count_assertions,
+    validate_and_extract_script_with_name,
+)
+
+GenerateFn = Callable[[str | None], Awaitable[Any]]
+ValidateFn = Callable[[str], tuple[str, str]]
+
+
+@dataclass
+class LadderResult:
+    script: str
+    test_name: str
+    token_usage: dict[str, Any] | None
+    model: str
+    warnings: list[str] = field(default_factory=list)
+
+
+def resolve_model_ladder(
+    ladder: tuple[str, ...] | list[str],
+    requested_model: str | None,
+) -> list[str | None]:
+    """Return the models to try, cheapest first.
+
+    The requested model acts as the quality ceiling: when it is part of the
+    ladder only the rungs up to it are used, when it is not the ladder is
+    bypassed so an explicit choice is always honored.
+    """
+    rungs = [name for name in ladder if name]
+    if not rungs:
+        return [requested_model]
+    if requested_model is None:
+        return list(rungs)
+    if requested_model not in rungs:
+        return [requested_model]
+    return rungs[: rungs.index(requested_model) + 1]
+
+
+def unpack_generation_result(
+    generation_result: Any, fallback_model: str | None
+) -> tuple[str, dict[str, Any] | None, str]:
+    if isinstance(generation_result, tuple):
+        raw_script, token_usage, model_name = generation_result
+        return raw_script, token_usage, model_name
+    return generation_result, None, fallback_model or "unknown"
+
+
+def merge_usage(
+    total: dict[str, Any] | None, usage: dict[str, Any] | None
+) -> dict[str, Any] | None:
+    if usage is None:
+        return total
+    if total is None:
+        return dict(usage)
+    merged = dict(total)
+    for key, value in usage.items():
+        current = merged.get(key)
+        if isinstance(value, (int, float)) and isinstance(current, (int, float)):
+            merged[key] = current + value
+        elif key not in merged:
+            merged[key] = value
+    return merged
+
+
+async def generate_with_model_ladder(
+    generate: GenerateFn,
+    models: list[str | None],
+    *,
+    min_assertions: int = 1,
+    validate: ValidateFn = validate_and_extract_script_with_name,
+) -> LadderResult:
+    """Run ``generate`` on each model until one yields an acceptable script.
+
+    ``validate`` returns ``(script, test_name)`` or raises
+    ``ScriptValidationError``. A rung is rejected when its output fails
+    validation or has fewer than ``min_assertions`` assertions. The last rung
+    accepts low-quality output; when it fails validation the best valid script
+    of an earlier rung is returned instead, and only without one does its
+    error propagate.
+    """
+    if not models:
+        raise ValueError("model ladder must contain at least one model")
+
+    warnings: list[str] = []
+    total_usage: dict[str, Any] | None = None
+    last_index = len(models) - 1
+    # (assertion count, attempt, script, test name, model) of the strongest
+    # earlier rung that was only rejected for having too few assertions.
+    best: tuple[int, int, str, str, str] | None = None
+
+    for index, model in enumerate(models):
+        raw_script, token_usage, model_name = unpack_generation_result(
+            await generate(model), model
+        )
+        total_usage = merge_usage(total_usage, token_usage)
+        is_last = index == last_index
+
+        try:
+            script, test_name = validate(raw_script)
+        except ScriptValidationError as error:
+            if is_last and best is None:
+                raise
+            warnings.append(
+                f"model ladder: attempt {index + 1} with {model_name} rejected ({error})"
+            )
+            if is_last:
+                best_count, best_attempt, script, test_name, best_model = best
+                warnings.append(
+                    f"model ladder: falling back to attempt {best_attempt} with "
+                    f"{best_model} ({best_count} assertion(s))"
+                )
+                return LadderResult(
+                    script=script,
+                    test_name=test_name,
+                    token_usage=total_usage,
+                    model=best_model,
+                    warnings=warnings,
+                )
+            continue
+
+        assertion_count = count_assertions(script)
+        if not is_last and assertion_count < min_assertions:
+            warnings.append(
+                f"model ladder: attempt {index + 1} with {model_name} rejected "
+                f"(only {assertion_count} assertion(s), need {min_assertions})"
+            )
+            if best is None or assertion_count > best[0]:
+                best = (assertion_count, index + 1, script, test_name, model_name)
+            continue
+
+        if warnings:
+            warnings.append(
+                f"model ladder: escalated to {model_name} after {index} rejected attempt(s)"
+            )
+        return LadderResult(
+            script=script,
+            test_name=test_name,
+            token_usage=total_usage,
+            model=model_name,
+            warnings=warnings,
+        )
+
+    raise AssertionError("unreachable")  # pragma: no cover
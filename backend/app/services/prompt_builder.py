@@ -14,6 +14,28 @@ Hard requirements:
 - If context is insufficient, still return a best-effort executable test.
 """
 
+SUITE_CONFTEST_PROMPT = """You are a senior QA automation engineer.
+Generate the shared conftest.py for a pytest + playwright.sync_api suite that covers several pages of one flow.
+Hard requirements:
+- Return one complete conftest.py module and nothing else.
+- Define @pytest.fixture fixtures and page-object helpers for the setup, navigation and selectors the pages share.
+- Build on pytest-playwright's `page` fixture; do not define test functions.
+- No pseudocode, no TODO placeholders.
+"""
+
+SUITE_PAGE_PROMPT = (
+    SYSTEM_PROMPT
+    + """- This module is part of a suite; reuse the fixtures and helpers of the given conftest.py instead of redefining them.
+"""
+)
+
+
+def _user_message(instruction: str, payload: dict[str, Any]) -> dict[str, str]:
+    return {
+        "role": "user",
+        "content": instruction + "\n" + json.dumps(payload, ensure_ascii=True, indent=2),
+    }
+
 
 def build_generation_messages(
     page_url: str,
@@ -30,9 +52,41 @@ def build_generation_messages(
 
     return [
         {"role": "system", "content": SYSTEM_PROMPT},
-        {
-            "role": "user",
-            "content": "Generate a Playwright test module from this context:\n"
-            + json.dumps(user_payload, ensure_ascii=True, indent=2),
-        },
+        _user_message("Generate a Playwright test module from this context:", user_payload),
+    ]
+
+
+def build_suite_conftest_messages(pages: list[dict[str, Any]]) -> list[dict[str, str]]:
+    user_payload = {
+        "pages": pages,
+        "target_style": "pytest_sync",
+        "python_api": "playwright.sync_api",
+    }
+
+    return [
+        {"role": "system", "content": SUITE_CONFTEST_PROMPT},
+        _user_message("Generate the shared conftest.py for these pages:", user_payload),
+    ]
+
+
+def build_suite_page_messages(
+    page_url: str,
+    output_markdown: str,
+    annotations: list[dict[str, Any]],
+    conftest_source: str,
+    module_name: str,
+) -> list[dict[str, str]]:
+    user_payload = {
+        "module_name": module_name,
+        "page_url": page_url,
+        "output_markdown": output_markdown,
+        "annotations": annotations,
+        "conftest_py": conftest_source,
+        "target_style": "pytest_sync",
+        "python_api": "playwright.sync_api",
+    }
+
+    return [
+        {"role": "system", "content": SUITE_PAGE_PROMPT},
+        _user_message("Generate this page's Playwright test module from this context:", user_payload),
     ]
@@ -8,32 +8,56 @@ class ScriptValidationError(ValueError):
 
 
 CODE_BLOCK_RE = re.compile(r"```(?:python)?\s*(.*?)```", re.DOTALL | re.IGNORECASE)
+TEST_NAME_RE = re.compile(r"def\s+(test_[A-Za-z0-9_]+)\s*\(")
+ASSERTION_RE = re.compile(r"^\s*(?:assert\b|expect\s*\()", re.MULTILINE)
 
 
 def _unwrap_code_fence(script_text: str) -> str:
-    match = CODE_BLOCK_RE.search(script_text)
-    if match:
-        return match.group(1).strip()
-    return script_text.strip()
+    # For a closed block, same result as CODE_BLOCK_RE.search(), using str.find()
+    # instead of a lazy DOTALL scan that dominates validation time on long modules.
+    start = script_text.find("```")
+    if start == -1:
+        return script_text.strip()
+    body_start = start + 3
+    if script_text[body_start : body_start + 6].lower() == "python":
+        body_start += 6
+    end = script_text.find("```", body_start)
+    if end != -1:
+        return script_text[body_start:end].strip()
+
+    # A stop sequence such as "\n```\n" makes the provider omit the closing
+    # fence: keep everything after the opening fence line.
+    line_end = script_text.find("\n", start)
+    if line_end == -1:
+        return script_text[body_start:].strip()
+    return script_text[line_end + 1 :].strip()
 
 
 def _extract_test_name(script: str) -> str:
-    match = re.search(r"def\s+(test_[A-Za-z0-9_]+)\s*\(", script)
+    match = TEST_NAME_RE.search(script)
     if not match:
         raise ScriptValidationError("LLM response does not include a pytest test function")
     return match.group(1)
 
 
-def validate_and_extract_script(script_text: str) -> str:
+def validate_and_extract_script_with_name(script_text: str) -> tuple[str, str]:
+    """Unwrap and validate ``script_text`` once, returning ``(script, test_name)``."""
     script = _unwrap_code_fence(script_text)
 
     if "playwright.sync_api" not in script:
         raise ScriptValidationError("Script must import playwright.sync_api")
 
-    _extract_test_name(script)
-    return script
+    return script, _extract_test_name(script)
+
+
+def validate_and_extract_script(script_text: str) -> str:
+    return validate_and_extract_script_with_name(script_text)[0]
 
 
 def extract_test_name(script_text: str) -> str:
     script = _unwrap_code_fence(script_text)
     return _extract_test_name(script)
+
+
+def count_assertions(script: str) -> int:
+    return len(ASSERTION_RE.findall(script))
@@ -0,0 +1,245 @@
+from __future__ import annotations
+
+import ast
+import io
+import re
+import zipfile
+from collections.abc import Iterator
+from urllib.parse import urlsplit
+
+from app.services.model_ladder import ValidateFn
+from app.services.script_validator import (
+    ScriptValidationError,
+    _unwrap_code_fence,
+    validate_and_extract_script_with_name,
+)
+
+# Fixtures that pytest and pytest-playwright provide without a conftest.py.
+BUILTIN_FIXTURES = frozenset(
+    {
+        # pytest-playwright (and pytest-base-url)
+        "page",
+        "context",
+        "new_context",
+        "browser",
+        "browser_name",
+        "browser_channel",
+        "browser_type",
+        "browser_context_args",
+        "browser_type_launch_args",
+        "connect_options",
+        "launch_browser",
+        "device",
+        "output_path",
+        "delete_output_dir",
+        "base_url",
+        "playwright",
+        "is_chromium",
+        "is_firefox",
+        "is_webkit",
+        # pytest
+        "request",
+        "cache",
+        "capfd",
+        "capfdbinary",
+        "caplog",
+        "capsys",
+        "capsysbinary",
+        "doctest_namespace",
+        "monkeypatch",
+        "pytestconfig",
+        "pytester",
+        "record_property",
+        "record_testsuite_property",
+        "record_xml_attribute",
+        "recwarn",
+        "testdir",
+        "tmp_path",
+        "tmp_path_factory",
+        "tmpdir",
+        "tmpdir_factory",
+    }
+)
+NON_IDENTIFIER_RE = re.compile(r"[^0-9a-zA-Z_]+")
+
+
+def _identifier(value: str, fallback: str) -> str:
+    slug = NON_IDENTIFIER_RE.sub("_", value).strip("_").lower()
+    if not slug:
+        return fallback
+    if slug[0].isdigit():
+        slug = f"_{slug}"
+    return slug
+
+
+def suite_directory_name(suite_name: str) -> str:
+    return _identifier(suite_name, "playwright_suite")
+
+
+def module_name_for_page(page_url: str, used: set[str]) -> str:
+    """Return a unique ``test_<path>`` module name for ``page_url``."""
+    parts = urlsplit(page_url)
+    base = "test_" + _identifier(parts.path, "") if parts.path.strip("/") else "test_home"
+    if base == "test_":
+        base = "test_home"
+    name = base
+    suffix = 2
+    while name in used:
+        name = f"{base}_{suffix}"
+        suffix += 1
+    used.add(name)
+    return name
+
+
+def _parse(source: str, filename: str) -> ast.Module:
+    try:
+        return ast.parse(source, filename=filename)
+    except SyntaxError as error:
+        raise ScriptValidationError(
+            f"{filename} is not valid Python: {error.msg} (line {error.lineno})"
+        ) from error
+
+
+def _is_fixture_decorator(decorator: ast.expr) -> bool:
+    if isinstance(decorator, ast.Call):
+        decorator = decorator.func
+    if isinstance(decorator, ast.Attribute):
+        return decorator.attr == "fixture"
+    return isinstance(decorator, ast.Name) and decorator.id == "fixture"
+
+
+def _fixture_name(function: ast.FunctionDef | ast.AsyncFunctionDef) -> str | None:
+    """Name a fixture is requested by, honoring ``@pytest.fixture(name=...)``."""
+    for decorator in function.decorator_list:
+        if not _is_fixture_decorator(decorator):
+            continue
+        if isinstance(decorator, ast.Call):
+            for keyword in decorator.keywords:
+                if (
+                    keyword.arg == "name"
+                    and isinstance(keyword.value, ast.Constant)
+                    and isinstance(keyword.value.value, str)
+                ):
+                    return keyword.value.value
+        return function.name
+    return None
+
+
+def _fixture_names(tree: ast.Module) -> set[str]:
+    return {
+        name
+        for node in ast.walk(tree)
+        if isinstance(node, (ast.FunctionDef, ast.AsyncFunctionDef))
+        and (name := _fixture_name(node)) is not None
+    }
+
+
+def validate_conftest(text: str) -> tuple[str, str]:
+    """Ladder validator for the shared ``conftest.py``; it has no test name."""
+    source = _unwrap_code_fence(text)
+    tree = _parse(source, "conftest.py")
+    if not _fixture_names(tree):
+        raise ScriptValidationError("conftest.py must define at least one pytest fixture")
+    return source, ""
+
+
+def _parametrized_names(decorators: list[ast.expr]) -> set[str]:
+    """Argument names supplied by ``@pytest.mark.parametrize`` rather than fixtures."""
+    names: set[str] = set()
+    for decorator in decorators:
+        if not (
+            isinstance(decorator, ast.Call)
+            and isinstance(decorator.func, ast.Attribute)
+            and decorator.func.attr == "parametrize"
+            and decorator.args
+        ):
+            continue
+        argnames = decorator.args[0]
+        if isinstance(argnames, ast.Constant) and isinstance(argnames.value, str):
+            names.update(name.strip() for name in argnames.value.split(","))
+        elif isinstance(argnames, (ast.List, ast.Tuple)):
+            names.update(
+                element.value
+                for element in argnames.elts
+                if isinstance(element, ast.Constant) and isinstance(element.value, str)
+            )
+    return names
+
+
+def _fixture_parameters(
+    function: ast.FunctionDef | ast.AsyncFunctionDef, skip: int, parametrized: set[str]
+) -> list[str]:
+    parametrized = parametrized | _parametrized_names(function.decorator_list)
+    return [
+        argument.arg
+        for argument in function.args.args[skip:]
+        if argument.arg not in parametrized
+    ]
+
+
+def _test_functions(tree: ast.Module) -> Iterator[tuple[str, list[str]]]:
+    """Yield ``(name, fixture parameters)`` for module-level and ``Test*`` class tests."""
+    for node in tree.body:
+        if isinstance(node, (ast.FunctionDef, ast.AsyncFunctionDef)):
+            if node.name.startswith("test"):
+                yield node.name, _fixture_parameters(node, 0, set())
+        elif isinstance(node, ast.ClassDef) and node.name.startswith("Test"):
+            class_parametrized = _parametrized_names(node.decorator_list)
+            for method in node.body:
+                if isinstance(method, (ast.FunctionDef, ast.AsyncFunctionDef)) and (
+                    method.name.startswith("test")
+                ):
+                    yield (
+                        f"{node.name}.{method.name}",
+                        _fixture_parameters(method, 1, class_parametrized),
+                    )
+
+
+def suite_module_validator(conftest_source: str) -> ValidateFn:
+    """Build the ladder validator for per-page modules of one suite.
+
+    On top of the usual checks a module must parse and may only request
+    fixtures from the conftest, itself or pytest/pytest-playwright, so a
+    module that would fail at collection is rejected and escalated.
+    """
+    conftest_fixtures = BUILTIN_FIXTURES | _fixture_names(_parse(conftest_source, "conftest.py"))
+
+    def validate(text: str) -> tuple[str, str]:
+        script, test_name = validate_and_extract_script_with_name(text)
+        tree = _parse(script, f"{test_name}.py")
+        available = conftest_fixtures | _fixture_names(tree)
+        unknown = sorted(
+            {
+                f"{name} uses '{fixture}'"
+                for name, fixtures in _test_functions(tree)
+                for fixture in fixtures
+                if fixture not in available
+            }
+        )
+        if unknown:
+            raise ScriptValidationError("unknown fixtures: " + "; ".join(unknown))
+        return script, test_name
+
+    return validate
+
+
+def check_suite(modules: dict[str, str]) -> list[str]:
+    """Return warnings for tests defined under the same name in several modules."""
+    warnings: list[str] = []
+    seen_tests: dict[str, str] = {}
+
+    for module_name, source in modules.items():
+        filename = f"{module_name}.py"
+        for name, _ in _test_functions(_parse(source, filename)):
+            if name in seen_tests:
+                warnings.append(f"{filename}: {name} is also defined in {seen_tests[name]}")
+            seen_tests.setdefault(name, filename)
+    return warnings
+
+
+def build_suite_archive(directory: str, files: dict[str, str]) -> bytes:
+    buffer = io.BytesIO()
+    with zipfile.ZipFile(buffer, "w", compression=zipfile.ZIP_DEFLATED) as archive:
+        for path, source in files.items():
+            archive.writestr(f"{directory}/{path}", source.rstrip() + "\n")
+    return buffer.getvalue()
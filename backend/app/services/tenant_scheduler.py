@@ -0,0 +1,430 @@
+from __future__ import annotations
+
+import asyncio
+import heapq
+import itertools
+import os
+import time
+from collections.abc import AsyncIterator, Callable
+from contextlib import asynccontextmanager
+from dataclasses import dataclass
+from typing import Any
+
+from app.config import load_env_file
+
+DEFAULT_TENANT = "default"
+SPECULATIVE_TENANT = "speculative"
+DEFAULT_SPECULATIVE_WEIGHT = 0.25
+SERVICE_TIME_EWMA_ALPHA = 0.2
+SERVICE_TIME_HALF_LIFE_SECONDS = 60.0
+DEFAULT_MAX_TENANTS = 256
+
+
+class QuotaExceededError(RuntimeError):
+    def __init__(self, tenant: str, retry_after_seconds: float) -> None:
+        super().__init__(f"Token quota exceeded for tenant '{tenant}'")
+        self.tenant = tenant
+        self.retry_after_seconds = retry_after_seconds
+
+
+class DeadlineExceededError(TimeoutError):
+    def __init__(self, tenant: str, remaining_seconds: float, expected_seconds: float) -> None:
+        super().__init__(
+            f"Dropped request for tenant '{tenant}': {int(max(remaining_seconds, 0) * 1000)}ms "
+            f"left, expected service time {int(expected_seconds * 1000)}ms"
+        )
+        self.tenant = tenant
+        self.remaining_seconds = remaining_seconds
+        self.expected_seconds = expected_seconds
+
+
+@dataclass
+class TenantPolicy:
+    weight: float = 1.0
+    tokens_per_minute: int | None = None
+
+
+@dataclass
+class TenantUsage:
+    requests: int = 0
+    upstream_calls: int = 0
+    rejected: int = 0
+    dropped: int = 0
+    prompt_tokens: int = 0
+    completion_tokens: int = 0
+    total_tokens: int = 0
+    estimated_tokens: int = 0
+
+
+class TokenBucket:
+    """Post-paid token bucket: usage is debited after the fact and may go negative."""
+
+    def __init__(
+        self,
+        capacity: float,
+        refill_per_second: float,
+        clock: Callable[[], float] = time.monotonic,
+    ) -> None:
+        self.capacity = capacity
+        self.refill_per_second = refill_per_second
+        self._clock = clock
+        self._tokens = capacity
+        self._updated_at = clock()
+
+    def available(self) -> float:
+        now = self._clock()
+        elapsed = max(now - self._updated_at, 0.0)
+        self._tokens = min(self.capacity, self._tokens + elapsed * self.refill_per_second)
+        self._updated_at = now
+        return self._tokens
+
+    def consume(self, amount: float) -> None:
+        self.available()
+        self._tokens -= amount
+
+    def seconds_until_available(self) -> float:
+        tokens = self.available()
+        if tokens > 0:
+            return 0.0
+        if self.refill_per_second <= 0:
+            return float("inf")
+        return (-tokens + 1) / self.refill_per_second
+
+
+def _parse_mapping(raw: str) -> dict[str, str]:
+    mapping: dict[str, str] = {}
+    for entry in raw.split(","):
+        key, separator, value = entry.partition(":")
+        key = key.strip()
+        value = value.strip()
+        if separator and key and value:
+            mapping[key] = value
+    return mapping
+
+
+def extract_token_counts(usage: dict[str, Any] | None) -> tuple[int, int, int]:
+    """Return ``(prompt, completion, total)`` from Responses or Chat usage payloads."""
+    if not usage:
+        return 0, 0, 0
+    prompt = int(usage.get("input_tokens") or usage.get("prompt_tokens") or 0)
+    completion = int(usage.get("output_tokens") or usage.get("completion_tokens") or 0)
+    total = int(usage.get("total_tokens") or prompt + completion)
+    return prompt, completion, total
+
+
+def extract_estimated_tokens(usage: dict[str, Any] | None) -> int:
+    """Return the client-side estimate a cut stream reports under ``usage["estimated"]``."""
+    estimated = (usage or {}).get("estimated")
+    if not isinstance(estimated, dict):
+        return 0
+    return extract_token_counts(estimated)[2]
+
+
+class TenantScheduler:
+    """Divide upstream concurrency between tenants with weighted fair queueing.
+
+    Each upstream call gets a virtual finish tag of ``start + 1 / weight``;
+    when all slots are busy the waiter with the smallest tag is admitted next,
+    so a tenant with weight 4 gets four slots for every one of a weight-1
+    tenant under contention, and an idle tenant never waits behind a backlog.
+    The admitted tenant's own waiters are served earliest-deadline-first.
+    """
+
+    def __init__(
+        self,
+        max_concurrency: int = 4,
+        policies: dict[str, TenantPolicy] | None = None,
+        default_policy: TenantPolicy | None = None,
+        api_keys: dict[str, str] | None = None,
+        header_tenants: set[str] | frozenset[str] | None = None,
+        max_tenants: int = DEFAULT_MAX_TENANTS,
+        clock: Callable[[], float] = time.monotonic,
+    ) -> None:
+        self.max_concurrency = max(int(max_concurrency), 1)
+        self._policies = dict(policies or {})
+        self._default_policy = default_policy or TenantPolicy()
+        self._api_keys = dict(api_keys or {})
+        self._header_tenants = frozenset(header_tenants or ())
+        self.max_tenants = max(int(max_tenants), 1)
+        self._clock = clock
+        self._active = 0
+        self._virtual_time = 0.0
+        self._last_finish: dict[str, float] = {}
+        self._tags: list[tuple[float, int, float, str]] = []
+        self._queues: dict[
+            str, list[tuple[float, int, asyncio.Future[None], str | None, bool]]
+        ] = {}
+        self._service_times: dict[str | None, tuple[float, float]] = {}
+        self._sequence = itertools.count()
+        self._buckets: dict[str, TokenBucket] = {}
+        self._usage: dict[str, TenantUsage] = {}
+        self._in_flight: dict[str, int] = {}
+
+    @classmethod
+    def from_env(cls) -> "TenantScheduler":
+        load_env_file(override_existing=True)
+        max_concurrency = int(os.getenv("LLM_MAX_CONCURRENCY", "4"))
+        weights = _parse_mapping(os.getenv("TENANT_WEIGHTS", ""))
+        quotas = _parse_mapping(os.getenv("TENANT_TOKEN_QUOTAS", ""))
+        api_keys = _parse_mapping(os.getenv("TENANT_API_KEYS", ""))
+        header_tenants = {
+            tenant.strip()
+            for tenant in os.getenv("TENANT_HEADER_ALLOWLIST", "").split(",")
+            if tenant.strip()
+        }
+
+        policies = {
+            tenant: TenantPolicy(
+                weight=float(weights.get(tenant, 1.0)),
+                tokens_per_minute=int(quotas[tenant]) if tenant in quotas else None,
+            )
+            for tenant in set(weights) | set(quotas)
+            if tenant != "*"
+        }
+        policies.setdefault(SPECULATIVE_TENANT, TenantPolicy(weight=DEFAULT_SPECULATIVE_WEIGHT))
+        default_policy = TenantPolicy(
+            weight=float(weights.get("*", 1.0)),
+            tokens_per_minute=int(quotas["*"]) if "*" in quotas else None,
+        )
+        return cls(
+            max_concurrency=max_concurrency,
+            policies=policies,
+            default_policy=default_policy,
+            api_keys=api_keys,
+            header_tenants=header_tenants,
+            max_tenants=int(os.getenv("TENANT_MAX_TRACKED", str(DEFAULT_MAX_TENANTS))),
+        )
+
+    def policy_for(self, tenant: str) -> TenantPolicy:
+        return self._policies.get(tenant, self._default_policy)
+
+    def resolve_tenant(
+        self, *, api_key: str | None = None, tenant_header: str | None = None
+    ) -> str:
+        """Map a request to a tenant; anything unverified falls back to ``default``.
+
+        An API key listed in ``api_keys`` always wins. The tenant header is only
+        trusted for tenants in ``header_tenants``, or, when neither API keys nor
+        an allowlist are configured, for any tenant until ``max_tenants`` tenants
+        are tracked. The speculative tenant can never be claimed.
+        """
+        if api_key and api_key in self._api_keys:
+            return self._api_keys[api_key]
+        tenant = (tenant_header or "").strip()
+        if not tenant or tenant == SPECULATIVE_TENANT:
+            return DEFAULT_TENANT
+        if tenant in self._header_tenants:
+            return tenant
+        if self._api_keys or self._header_tenants:
+            return DEFAULT_TENANT
+        if tenant not in self._usage and len(self._usage) >= self.max_tenants:
+            return DEFAULT_TENANT
+        return tenant
+
+    def _usage_for(self, tenant: str) -> TenantUsage:
+        return self._usage.setdefault(tenant, TenantUsage())
+
+    def _bucket_for(self, tenant: str) -> TokenBucket | None:
+        quota = self.policy_for(tenant).tokens_per_minute
+        if quota is None:
+            return None
+        bucket = self._buckets.get(tenant)
+        if bucket is None:
+            bucket = TokenBucket(float(quota), quota / 60.0, clock=self._clock)
+            self._buckets[tenant] = bucket
+        return bucket
+
+    def check_quota(self, tenant: str) -> None:
+        usage = self._usage_for(tenant)
+        bucket = self._bucket_for(tenant)
+        if bucket is not None and bucket.available() <= 0:
+            usage.rejected += 1
+            raise QuotaExceededError(tenant, bucket.seconds_until_available())
+        usage.requests += 1
+
+    def record_usage(
+        self,
+        tenant: str,
+        token_usage: dict[str, Any] | None,
+        *,
+        estimated_tokens: int = 0,
+    ) -> None:
+        """Count provider-reported usage and debit the tenant's bucket.
+
+        ``estimated_tokens`` covers calls without provider usage (e.g. streams
+        cut at the closing fence): it is debited from the bucket when no real
+        total is reported, but kept out of the provider token counters.
+        """
+        prompt, completion, total = extract_token_counts(token_usage)
+        usage = self._usage_for(tenant)
+        usage.prompt_tokens += prompt
+        usage.completion_tokens += completion
+        usage.total_tokens += total
+        debit = total
+        if not total and estimated_tokens:
+            usage.estimated_tokens += estimated_tokens
+            debit = estimated_tokens
+        bucket = self._bucket_for(tenant)
+        if bucket is not None and debit:
+            bucket.consume(debit)
+
+    def now(self) -> float:
+        return self._clock()
+
+    def expected_service_seconds(self, service_key: str | None = None) -> float:
+        """EWMA of service time for ``service_key`` (e.g. a model), decayed with age.
+
+        The estimate halves every ``SERVICE_TIME_HALF_LIFE_SECONDS`` without a
+        new observation, so one slow call cannot keep short budgets out forever.
+        """
+        observed = self._service_times.get(service_key)
+        if observed is None:
+            return 0.0
+        ewma, observed_at = observed
+        age = max(self._clock() - observed_at, 0.0)
+        return ewma * 0.5 ** (age / SERVICE_TIME_HALF_LIFE_SECONDS)
+
+    def _observe_service_time(self, service_key: str | None, seconds: float) -> None:
+        current = self._service_times.get(service_key)
+        if current is None:
+            ewma = seconds
+        else:
+            ewma = self.expected_service_seconds(service_key)
+            ewma += SERVICE_TIME_EWMA_ALPHA * (seconds - ewma)
+        self._service_times[service_key] = (ewma, self._clock())
+
+    def _check_deadline(
+        self,
+        tenant: str,
+        deadline: float,
+        service_key: str | None = None,
+        *,
+        queued: bool = True,
+    ) -> DeadlineExceededError | None:
+        remaining = deadline - self._clock()
+        expected = self.expected_service_seconds(service_key) if queued else 0.0
+        if remaining > 0 and remaining >= expected:
+            return None
+        self._usage_for(tenant).dropped += 1
+        return DeadlineExceededError(tenant, remaining, expected)
+
+    def _pop_next_waiter(self, tenant: str) -> asyncio.Future[None] | None:
+        queue = self._queues.get(tenant) or []
+        while queue:
+            deadline, _, future, service_key, queued = heapq.heappop(queue)
+            if future.done():
+                continue
+            error = self._check_deadline(tenant, deadline, service_key, queued=queued)
+            if error is not None:
+                future.set_exception(error)
+                continue
+            return future
+        return None
+
+    def _dispatch(self) -> None:
+        while self._tags and self._active < self.max_concurrency:
+            _, _, start, tenant = heapq.heappop(self._tags)
+            future = self._pop_next_waiter(tenant)
+            if future is None:
+                continue
+            self._active += 1
+            self._in_flight[tenant] = self._in_flight.get(tenant, 0) + 1
+            self._virtual_time = max(self._virtual_time, start)
+            future.set_result(None)
+
+    def _release(self, tenant: str) -> None:
+        self._active -= 1
+        self._in_flight[tenant] = max(self._in_flight.get(tenant, 0) - 1, 0)
+        self._dispatch()
+
+    async def _acquire(
+        self, tenant: str, deadline: float | None, service_key: str | None
+    ) -> None:
+        # Only a call that has to queue is judged against the expected service
+        # time; with a free slot it starts right away.
+        queued = bool(self._tags) or self._active >= self.max_concurrency
+        if deadline is not None:
+            error = self._check_deadline(tenant, deadline, service_key, queued=queued)
+            if error is not None:
+                raise error
+
+        weight = max(self.policy_for(tenant).weight, 1e-6)
+        start = max(self._virtual_time, self._last_finish.get(tenant, 0.0))
+        finish = start + 1.0 / weight
+        self._last_finish[tenant] = finish
+
+        sequence = next(self._sequence)
+        future: asyncio.Future[None] = asyncio.get_running_loop().create_future()
+        heapq.heappush(self._tags, (finish, sequence, start, tenant))
+        heapq.heappush(
+            self._queues.setdefault(tenant, []),
+            (
+                float("inf") if deadline is None else deadline,
+                sequence,
+                future,
+                service_key,
+                queued,
+            ),
+        )
+        self._dispatch()
+        try:
+            await future
+        except asyncio.CancelledError:
+            if not future.done():
+                future.cancel()
+            elif not future.cancelled() and future.exception() is None:
+                # The slot was granted in the same tick as the cancellation.
+                self._release(tenant)
+            raise
+
+    @asynccontextmanager
+    async def slot(
+        self,
+        tenant: str,
+        deadline: float | None = None,
+        service_key: str | None = None,
+    ) -> AsyncIterator[None]:
+        """Hold one upstream slot for ``tenant``.
+
+        Within a tenant, waiters are admitted earliest-deadline-first. A waiter
+        that has to queue and whose remaining budget (``deadline`` on this
+        scheduler's clock) is below the expected service time of
+        ``service_key`` is dropped with ``DeadlineExceededError`` instead of
+        spending upstream capacity on an answer nobody will read.
+        """
+        await self._acquire(tenant, deadline, service_key)
+        self._usage_for(tenant).upstream_calls += 1
+        started_at = self._clock()
+        try:
+            yield
+        finally:
+            self._observe_service_time(service_key, self._clock() - started_at)
+            self._release(tenant)
+
+    def usage_snapshot(self) -> dict[str, dict[str, Any]]:
+        queued = {
+            tenant: sum(1 for entry in queue if not entry[2].done())
+            for tenant, queue in self._queues.items()
+        }
+
+        snapshot: dict[str, dict[str, Any]] = {}
+        for tenant in sorted(set(self._usage) | set(queued)):
+            usage = self._usage_for(tenant)
+            policy = self.policy_for(tenant)
+            bucket = self._bucket_for(tenant)
+            snapshot[tenant] = {
+                "weight": policy.weight,
+                "tokens_per_minute": policy.tokens_per_minute,
+                "quota_remaining": None if bucket is None else max(int(bucket.available()), 0),
+                "requests": usage.requests,
+                "upstream_calls": usage.upstream_calls,
+                "rejected": usage.rejected,
+                "dropped": usage.dropped,
+                "prompt_tokens": usage.prompt_tokens,
+                "completion_tokens": usage.completion_tokens,
+                "total_tokens": usage.total_tokens,
+                "estimated_tokens": usage.estimated_tokens,
+                "in_flight": self._in_flight.get(tenant, 0),
+                "queued": queued.get(tenant, 0),
+            }
+        return snapshot
@@ -0,0 +1,197 @@
+from __future__ import annotations
+
+import atexit
+import gzip
+import json
+import os
+import queue
+import re
+import threading
+import time
+from collections.abc import Iterator
+from pathlib import Path
+from typing import Any
+from urllib.parse import urlsplit, urlunsplit
+
+from app.config import load_env_file
+
+CAPTURE_FORMAT_VERSION = 1
+SENSITIVE_KEY_RE = re.compile(r"(authorization|api[_-]?key|token|secret|password|cookie)", re.I)
+URL_RE = re.compile(r"[A-Za-z][A-Za-z0-9+.-]*://[^\s'\"<>`]+")
+EMAIL_RE = re.compile(r"[A-Za-z0-9._%+-]+@[A-Za-z0-9.-]+\.[A-Za-z]{2,}")
+REDACTED = "[redacted]"
+
+
+def _strip_url_secrets(url: str) -> str:
+    try:
+        parts = urlsplit(url)
+        port = parts.port
+    except ValueError:
+        return REDACTED
+    netloc = parts.hostname or ""
+    if port is not None:
+        netloc = f"{netloc}:{port}"
+    return urlunsplit((parts.scheme, netloc, parts.path, "", ""))
+
+
+def sanitize_payload(value: Any) -> Any:
+    """Drop credentials, URL userinfo/query strings and e-mail addresses from a payload.
+
+    URLs are cleaned wherever they appear in a string, e.g. inside
+    ``output_markdown`` or a generated ``page.goto()`` call.
+    """
+    if isinstance(value, dict):
+        sanitized: dict[str, Any] = {}
+        for key, nested in value.items():
+            if SENSITIVE_KEY_RE.search(str(key)):
+                sanitized[key] = REDACTED
+            else:
+                sanitized[key] = sanitize_payload(nested)
+        return sanitized
+    if isinstance(value, list):
+        return [sanitize_payload(item) for item in value]
+    if isinstance(value, str):
+        value = URL_RE.sub(lambda match: _strip_url_secrets(match.group()), value)
+        return EMAIL_RE.sub(REDACTED, value)
+    return value
+
+
+class CaptureSession:
+    """Collects one generation request and its upstream calls for the recorder."""
+
+    def __init__(
+        self,
+        recorder: "TrafficRecorder",
+        request_payload: dict[str, Any],
+        *,
+        tenant: str,
+    ) -> None:
+        self._recorder = recorder
+        self._started_at = time.monotonic()
+        self._entry: dict[str, Any] = {
+            "version": CAPTURE_FORMAT_VERSION,
+            "captured_at": time.time(),
+            "tenant": tenant,
+            "request": sanitize_payload(request_payload),
+            "upstream": [],
+        }
+
+    def add_upstream(
+        self,
+        *,
+        requested_model: str | None,
+        generation_result: Any,
+        duration_seconds: float,
+    ) -> None:
+        if isinstance(generation_result, tuple):
+            text, usage, model_name = generation_result
+        else:
+            text, usage, model_name = generation_result, None, requested_model
+        self._entry["upstream"].append(
+            {
+                "requested_model": requested_model,
+                "model": model_name,
+                "text": sanitize_payload(text),
+                "usage": usage,
+                "duration_ms": round(duration_seconds * 1000, 3),
+            }
+        )
+
+    def finish(self, status_code: int) -> None:
+        self._entry["status"] = status_code
+        self._entry["duration_ms"] = round((time.monotonic() - self._started_at) * 1000, 3)
+        self._recorder.record(self._entry)
+
+
+class TrafficRecorder:
+    """Append captured traffic to a gzip JSONL file from a background thread.
+
+    ``record`` never blocks the request path: entries are handed to a bounded
+    queue and dropped (and counted) when the writer falls behind. Each flushed
+    batch is written as its own gzip member, so the file stays readable with
+    ``gzip.open`` even if the process dies mid-write.
+    """
+
+    def __init__(self, path: str | Path | None, *, max_queue: int = 1000) -> None:
+        self.path = Path(path).expanduser() if path else None
+        self.dropped = 0
+        self._queue: queue.Queue[dict[str, Any] | None] = queue.Queue(maxsize=max_queue)
+        self._thread: threading.Thread | None = None
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_env(cls) -> "TrafficRecorder":
+        load_env_file(override_existing=True)
+        return cls(os.getenv("TRAFFIC_CAPTURE_PATH") or None)
+
+    @property
+    def enabled(self) -> bool:
+        return self.path is not None
+
+    def start(
+        self,
+        request_payload: dict[str, Any],
+        *,
+        tenant: str,
+    ) -> CaptureSession | None:
+        if not self.enabled:
+            return None
+        return CaptureSession(self, request_payload, tenant=tenant)
+
+    def record(self, entry: dict[str, Any]) -> None:
+        if not self.enabled:
+            return
+        self._ensure_writer()
+        try:
+            self._queue.put_nowait(entry)
+        except queue.Full:
+            self.dropped += 1
+
+    def close(self, timeout: float = 5.0) -> None:
+        with self._lock:
+            thread = self._thread
+            self._thread = None
+        if thread is None:
+            return
+        self._queue.put(None)
+        thread.join(timeout)
+
+    def _ensure_writer(self) -> None:
+        with self._lock:
+            if self._thread is not None:
+                return
+            self._thread = threading.Thread(
+                target=self._run, name="traffic-capture-writer", daemon=True
+            )
+            self._thread.start()
+        atexit.register(self.close)
+
+    def _run(self) -> None:
+        assert self.path is not None
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        stopping = False
+        while not stopping:
+            batch = [self._queue.get()]
+            while True:
+                try:
+                    batch.append(self._queue.get_nowait())
+                except queue.Empty:
+                    break
+            if None in batch:
+                stopping = True
+                batch = [entry for entry in batch if entry is not None]
+            if not batch:
+                continue
+            lines = "".join(
+                json.dumps(entry, ensure_ascii=True, default=str) + "\n" for entry in batch
+            )
+            with gzip.open(self.path, "at", encoding="utf-8") as handle:
+                handle.write(lines)
+
+
+def read_capture(path: str | Path) -> Iterator[dict[str, Any]]:
+    with gzip.open(Path(path).expanduser(), "rt", encoding="utf-8") as handle:
+        for line in handle:
+            line = line.strip()
+            if line:
+                yield json.loads(line)
@@ -0,0 +1,181 @@
+"""Replay captured generation traffic through the app against a stub upstream.
+
+    python -m app.tools.replay_traffic captures/traffic.jsonl.gz --speed 10 --output run.json
+
+Requests are sent at their captured arrival offsets divided by ``--speed`` and
+each upstream call sleeps for its captured duration divided by ``--speed``;
+``--speed 0`` sends everything at once with no upstream latency. The printed
+summary can be diffed between builds to compare latency distributions.
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import hashlib
+import json
+import time
+from collections import defaultdict, deque
+from pathlib import Path
+from typing import Any
+
+import httpx
+
+from app.api.v1 import generation
+from app.main import app
+from app.services.generation_cache import GenerationCache
+from app.services.prompt_builder import build_generation_messages
+from app.services.traffic_capture import TrafficRecorder, read_capture
+
+GENERATION_PATH = "/api/v1/scripts/playwright-python"
+FALLBACK_SCRIPT = (
+    "from playwright.sync_api import Page\n\n"
+    "def test_replay_fallback(page: Page):\n"
+    "    assert page is not None\n"
+)
+
+
+def prompt_key(messages: list[dict[str, str]]) -> str:
+    encoded = json.dumps(messages, ensure_ascii=True, sort_keys=True).encode("utf-8")
+    return hashlib.sha256(encoded).hexdigest()
+
+
+def _request_prompt_key(request_payload: dict[str, Any]) -> str:
+    messages = build_generation_messages(
+        page_url=str(request_payload.get("page_url", "")),
+        output_markdown=request_payload.get("output_markdown", ""),
+        annotations=request_payload.get("annotations") or [],
+    )
+    return prompt_key(messages)
+
+
+class ReplayLLMClient:
+    """Serve captured upstream responses, matched by prompt, with captured latency."""
+
+    def __init__(self, entries: list[dict[str, Any]], *, speed: float, template: Any) -> None:
+        self._speed = speed
+        self._responses: dict[str, deque[dict[str, Any]]] = defaultdict(deque)
+        for entry in entries:
+            key = _request_prompt_key(entry["request"])
+            self._responses[key].extend(entry.get("upstream") or [])
+        self.timeout_seconds = getattr(template, "timeout_seconds", 60.0)
+        self.model_ladder = getattr(template, "model_ladder", ())
+        self.ladder_min_assertions = getattr(template, "ladder_min_assertions", 1)
+        self.misses = 0
+
+    async def generate_script(self, messages, model, temperature, timeout_seconds=None):
+        recorded = self._responses.get(prompt_key(messages))
+        if not recorded:
+            self.misses += 1
+            return FALLBACK_SCRIPT, None, model or "replay-stub"
+
+        upstream = recorded.popleft()
+        if self._speed > 0:
+            await asyncio.sleep(float(upstream.get("duration_ms") or 0) / 1000 / self._speed)
+        return upstream.get("text") or "", upstream.get("usage"), upstream.get("model") or model
+
+
+def _percentile(values: list[float], fraction: float) -> float | None:
+    if not values:
+        return None
+    ordered = sorted(values)
+    index = min(int(round(fraction * (len(ordered) - 1))), len(ordered) - 1)
+    return round(ordered[index], 3)
+
+
+def _distribution(values: list[float]) -> dict[str, float | None]:
+    return {
+        "p50": _percentile(values, 0.5),
+        "p90": _percentile(values, 0.9),
+        "p99": _percentile(values, 0.99),
+        "max": _percentile(values, 1.0),
+        "mean": round(sum(values) / len(values), 3) if values else None,
+    }
+
+
+def summarize(results: list[dict[str, Any]]) -> dict[str, Any]:
+    status_counts: dict[str, int] = defaultdict(int)
+    for result in results:
+        status_counts[str(result["status"])] += 1
+    return {
+        "requests": len(results),
+        "status_counts": dict(sorted(status_counts.items())),
+        "latency_ms": _distribution([r["latency_ms"] for r in results]),
+        "captured_latency_ms": _distribution(
+            [r["captured_latency_ms"] for r in results if r["captured_latency_ms"] is not None]
+        ),
+    }
+
+
+async def replay(entries: list[dict[str, Any]], *, speed: float = 1.0) -> list[dict[str, Any]]:
+    if not entries:
+        return []
+
+    stub = ReplayLLMClient(entries, speed=speed, template=generation.llm_client)
+    original_client = generation.llm_client
+    original_recorder = generation.traffic_recorder
+    original_cache = generation.generation_cache
+    generation.llm_client = stub
+    generation.traffic_recorder = TrafficRecorder(None)
+    generation.generation_cache = GenerationCache.from_env()
+
+    first_arrival = min(float(entry.get("captured_at") or 0) for entry in entries)
+    transport = httpx.ASGITransport(app=app)
+    try:
+        async with httpx.AsyncClient(transport=transport, base_url="http://replay") as client:
+            started_at = time.monotonic()
+
+            async def send(index: int, entry: dict[str, Any]) -> dict[str, Any]:
+                if speed > 0:
+                    offset = (float(entry.get("captured_at") or 0) - first_arrival) / speed
+                    await asyncio.sleep(max(offset - (time.monotonic() - started_at), 0))
+                sent_at = time.monotonic()
+                response = await client.post(
+                    GENERATION_PATH,
+                    json=entry["request"],
+                    headers={"X-Tenant-ID": entry.get("tenant") or "default"},
+                )
+                return {
+                    "index": index,
+                    "tenant": entry.get("tenant"),
+                    "status": response.status_code,
+                    "latency_ms": round((time.monotonic() - sent_at) * 1000, 3),
+                    "captured_status": entry.get("status"),
+                    "captured_latency_ms": entry.get("duration_ms"),
+                }
+
+            return list(
+                await asyncio.gather(*(send(i, entry) for i, entry in enumerate(entries)))
+            )
+    finally:
+        generation.llm_client = original_client
+        generation.traffic_recorder = original_recorder
+        generation.generation_cache = original_cache
+
+
+def main(argv: list[str] | None = None) -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("capture", type=Path, help="gzip JSONL capture file")
+    parser.add_argument(
+        "--speed",
+        type=float,
+        default=1.0,
+        help="time compression factor; 0 replays without delays (default: 1.0)",
+    )
+    parser.add_argument("--output", type=Path, help="write per-request results as JSON")
+    args = parser.parse_args(argv)
+
+    entries = list(read_capture(args.capture))
+    results = asyncio.run(replay(entries, speed=args.speed))
+    summary = summarize(results)
+
+    if args.output:
+        args.output.write_text(
+            json.dumps({"summary": summary, "results": results}, indent=2),
+            encoding="utf-8",
+        )
+    print(json.dumps(summary, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,221 @@
+"""Microbenchmarks for the pure-Python stages every generation request runs.
+
+Timings are reported relative to a fixed calibration workload so stored
+baselines carry over between machines. Refresh them after an intentional
+change with:
+
+    python -m benchmarks.hot_paths --update-baselines
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import timeit
+from collections.abc import Callable
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any
+
+from pydantic import BaseModel
+
+from app.services.llm_client import OpenAICompatibleLLMClient
+from app.services.prompt_builder import build_generation_messages
+from app.services.script_validator import validate_and_extract_script_with_name
+
+BASELINES_PATH = Path(__file__).with_name("baselines.json")
+REPEATS = 5
+
+
+class _ContentPart(BaseModel):
+    type: str = "output_text"
+    text: str
+    annotations: list[dict[str, Any]] = []
+
+
+class _OutputItem(BaseModel):
+    id: str
+    type: str = "message"
+    role: str = "assistant"
+    content: list[_ContentPart]
+
+
+class _Response(BaseModel):
+    id: str = "resp_benchmark"
+    model: str = "benchmark-model"
+    output: list[_OutputItem]
+    usage: dict[str, int] = {"input_tokens": 1, "output_tokens": 1, "total_tokens": 2}
+
+
+def long_script(test_count: int = 400) -> str:
+    lines = ["from playwright.sync_api import Page, expect", ""]
+    for index in range(test_count):
+        lines += [
+            f"def test_case_{index}(page: Page):",
+            f'    page.goto("https://example.com/page/{index}")',
+            f'    page.get_by_role("button", name="Action {index}").click()',
+            f'    expect(page.locator("#result-{index}")).to_have_text("Done {index}")',
+            "",
+        ]
+    return "Here is the test module:\n\n```python\n" + "\n".join(lines) + "```\n\nNotes follow."
+
+
+def annotations(count: int = 300) -> list[dict[str, Any]]:
+    return [
+        {
+            "id": f"a{index}",
+            "element": f"Button {index}",
+            "elementPath": f"main > section:nth-child({index}) > div.card > button.primary",
+            "comment": f"Action {index} should show a confirmation message with the order id",
+            "x": float(index),
+            "y": float(index * 2),
+            "timestamp": 1_700_000_000 + index,
+            "selectedText": f"Submit order {index}",
+            "cssClasses": "btn btn-primary",
+        }
+        for index in range(count)
+    ]
+
+
+def response_object(items: int = 60, parts: int = 8) -> _Response:
+    return _Response(
+        output=[
+            _OutputItem(
+                id=f"msg_{item}",
+                content=[
+                    _ContentPart(text=f"line {item}-{part} " * 8) for part in range(parts)
+                ],
+            )
+            for item in range(items)
+        ]
+    )
+
+
+def response_dict(items: int = 60, parts: int = 8) -> dict[str, Any]:
+    return response_object(items, parts).model_dump()
+
+
+def nested_text(text: str, depth: int) -> Any:
+    """Wrap ``text`` ``depth`` levels deep in the shapes ``_normalize_text`` unwraps."""
+    value: Any = text
+    for level in range(depth):
+        key = ("value", "content", "summary", "message")[level % 4]
+        value = {"text": None, key: [value] if level % 2 else value}
+    return value
+
+
+def response_nested_dict(items: int = 20, parts: int = 4, depth: int = 30) -> dict[str, Any]:
+    return {
+        "id": "resp_benchmark",
+        "output": [
+            {
+                "id": f"msg_{item}",
+                "type": "message",
+                "content": [
+                    {"type": "output_text", "text": nested_text(f"line {item}-{part}", depth)}
+                    for part in range(parts)
+                ],
+            }
+            for item in range(items)
+        ],
+    }
+
+
+@dataclass
+class BenchmarkCase:
+    name: str
+    run: Callable[[], Any]
+
+
+def benchmark_cases() -> list[BenchmarkCase]:
+    script = long_script()
+    annotation_payload = annotations()
+    messages = build_generation_messages(
+        page_url="https://example.com/checkout",
+        output_markdown="## Page Feedback\n" * 50,
+        annotations=annotation_payload,
+    )
+    response_obj = response_object()
+    response_data = response_dict()
+    response_nested = response_nested_dict()
+
+    return [
+        BenchmarkCase(
+            "build_generation_messages",
+            lambda: build_generation_messages(
+                page_url="https://example.com/checkout",
+                output_markdown="## Page Feedback\n" * 50,
+                annotations=annotation_payload,
+            ),
+        ),
+        BenchmarkCase(
+            "build_responses_input",
+            lambda: OpenAICompatibleLLMClient._build_responses_input(messages),
+        ),
+        BenchmarkCase(
+            "extract_responses_content_object",
+            lambda: OpenAICompatibleLLMClient._extract_responses_content(response_obj),
+        ),
+        BenchmarkCase(
+            "extract_responses_content_dict",
+            lambda: OpenAICompatibleLLMClient._extract_responses_content(response_data),
+        ),
+        BenchmarkCase(
+            "extract_responses_content_nested_dict",
+            lambda: OpenAICompatibleLLMClient._extract_responses_content(response_nested),
+        ),
+        BenchmarkCase(
+            "validate_and_extract_script",
+            lambda: validate_and_extract_script_with_name(script),
+        ),
+    ]
+
+
+def _calibration_workload() -> int:
+    total = 0
+    for index in range(20_000):
+        total += index * index % 7
+    return total
+
+
+def _seconds_per_call(function: Callable[[], Any]) -> float:
+    timer = timeit.Timer(function)
+    number, _ = timer.autorange()
+    return min(timer.repeat(repeat=REPEATS, number=number)) / number
+
+
+def measure(cases: list[BenchmarkCase] | None = None) -> dict[str, float]:
+    """Return each case's per-call time divided by the calibration workload's."""
+    calibration = _seconds_per_call(_calibration_workload)
+    return {
+        case.name: round(_seconds_per_call(case.run) / calibration, 4)
+        for case in cases or benchmark_cases()
+    }
+
+
+def load_baselines(path: Path = BASELINES_PATH) -> dict[str, float]:
+    return json.loads(path.read_text(encoding="utf-8"))
+
+
+def main(argv: list[str] | None = None) -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument(
+        "--update-baselines",
+        action="store_true",
+        help=f"write the measured ratios to {BASELINES_PATH.name}",
+    )
+    args = parser.parse_args(argv)
+
+    results = measure()
+    baselines = load_baselines() if BASELINES_PATH.exists() else {}
+    for name, ratio in results.items():
+        baseline = baselines.get(name)
+        change = f"{ratio / baseline:.2f}x baseline" if baseline else "no baseline"
+        print(f"{name:36} {ratio:10.4f}  ({change})")
+
+    if args.update_baselines:
+        BASELINES_PATH.write_text(json.dumps(results, indent=2) + "\n", encoding="utf-8")
+
+
+if __name__ == "__main__":
+    main()
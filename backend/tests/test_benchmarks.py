@@ -0,0 +1,29 @@
+import os
+
+import pytest
+
+from benchmarks.hot_paths import benchmark_cases, load_baselines, measure
+
+RUN_BENCHMARKS = os.getenv("AGENTATION_BENCHMARKS") == "1"
+REGRESSION_THRESHOLD = float(os.getenv("BENCHMARK_REGRESSION_THRESHOLD", "2.0"))
+
+
+def test_benchmark_cases_run_and_have_baselines():
+    baselines = load_baselines()
+
+    for case in benchmark_cases():
+        case.run()
+        assert case.name in baselines
+
+
+@pytest.mark.skipif(not RUN_BENCHMARKS, reason="set AGENTATION_BENCHMARKS=1 to run timing gates")
+@pytest.mark.parametrize("case", benchmark_cases(), ids=lambda case: case.name)
+def test_hot_path_has_not_regressed(case):
+    baseline = load_baselines()[case.name]
+
+    ratio = measure([case])[case.name]
+
+    assert ratio <= baseline * REGRESSION_THRESHOLD, (
+        f"{case.name} took {ratio:.4f} calibration units, "
+        f"baseline {baseline:.4f} (threshold {REGRESSION_THRESHOLD}x)"
+    )
@@ -86,3 +86,49 @@ def test_from_env_supports_dashscope_api_key_fallback(monkeypatch, tmp_path: Pat
     )
     assert client._config.api_key == "dashscope-key-from-dotenv"
     assert client._config.model == "qwen3.5-plus"
+
+
+def test_from_env_parses_model_ladder(monkeypatch, tmp_path: Path):
+    env_file = tmp_path / ".env"
+    env_file.write_text(
+        "\n".join(
+            [
+                "LLM_MODEL=gpt-4.1",
+                "LLM_MODEL_LADDER=gpt-4.1-nano, gpt-4.1-mini,,gpt-4.1",
+                "LLM_LADDER_MIN_ASSERTIONS=2",
+            ]
+        ),
+        encoding="utf-8",
+    )
+
+    monkeypatch.setenv("AGENTATION_ENV_FILE", str(env_file))
+
+    client = OpenAICompatibleLLMClient.from_env()
+
+    assert client.model_ladder == ("gpt-4.1-nano", "gpt-4.1-mini", "gpt-4.1")
+    assert client.ladder_min_assertions == 2
+    assert client._config.early_stop is False
+
+
+def test_from_env_parses_early_stop_settings(monkeypatch, tmp_path: Path):
+    env_file = tmp_path / ".env"
+    env_file.write_text(
+        "\n".join(
+            [
+                "LLM_EARLY_STOP=true",
+                "LLM_EARLY_STOP_CALIBRATION_EVERY=5",
+                "LLM_MAX_OUTPUT_TOKENS=1200",
+                "LLM_STOP_SEQUENCES=\\n```\\n",
+            ]
+        ),
+        encoding="utf-8",
+    )
+
+    monkeypatch.setenv("AGENTATION_ENV_FILE", str(env_file))
+
+    client = OpenAICompatibleLLMClient.from_env()
+
+    assert client._config.early_stop is True
+    assert client._config.early_stop_calibration_every == 5
+    assert client._config.max_output_tokens == 1200
+    assert client._config.stop_sequences == ("\n```\n",)
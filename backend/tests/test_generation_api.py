@@ -1,23 +1,54 @@
 import asyncio
+import time
+from types import SimpleNamespace
 
+import pytest
 from fastapi.testclient import TestClient
 
 from app.main import app
+from app.services.generation_cache import GenerationCache
+
+
+@pytest.fixture(autouse=True)
+def fresh_generation_cache(monkeypatch):
+    from app.api.v1 import generation
+
+    cache = GenerationCache()
+    monkeypatch.setattr(generation, "generation_cache", cache)
+    return cache
 
 
 class FakeClient:
-    async def generate_script(self, messages, model, temperature):
+    async def generate_script(self, messages, model, temperature, timeout_seconds=None):
         return "from playwright.sync_api import Page\\n\\ndef test_checkout(page: Page):\\n    assert page is not None"
 
 
 class SlowFakeClient:
     timeout_seconds = 1.0
 
-    async def generate_script(self, messages, model, temperature):
+    async def generate_script(self, messages, model, temperature, timeout_seconds=None):
         await asyncio.sleep(0.05)
         return "from playwright.sync_api import Page\\n\\ndef test_timeout(page: Page):\\n    assert page is not None"
 
 
+class LadderFakeClient:
+    model_ladder = ("fast-model", "gpt-4.1-mini")
+    ladder_min_assertions = 1
+
+    def __init__(self):
+        self.models = []
+
+    async def generate_script(self, messages, model, temperature, timeout_seconds=None):
+        self.models.append(model)
+        if model == "fast-model":
+            return ("print('not a test')", {"total_tokens": 4}, model)
+        return (
+            "from playwright.sync_api import Page\n\ndef test_ladder(page: Page):\n    assert page is not None",
+            {"total_tokens": 20},
+            model,
+        )
+
+
 def test_generate_script_endpoint(monkeypatch):
     from app.api.v1 import generation
 
@@ -78,3 +109,368 @@ def test_generate_script_endpoint_times_out(monkeypatch):
 
     assert response.status_code == 504
     assert "timed out" in response.json()["detail"]
+
+
+def test_generate_script_endpoint_escalates_model_ladder(monkeypatch):
+    from app.api.v1 import generation
+
+    fake_client = LadderFakeClient()
+    monkeypatch.setattr(generation, "llm_client", fake_client)
+
+    client = TestClient(app)
+
+    response = client.post(
+        "/api/v1/scripts/playwright-python",
+        json={
+            "page_url": "https://example.com/checkout",
+            "output_markdown": "## Page Feedback",
+            "annotations": [],
+            "model": "gpt-4.1-mini",
+        },
+    )
+
+    assert response.status_code == 200
+    data = response.json()
+    assert fake_client.models == ["fast-model", "gpt-4.1-mini"]
+    assert data["test_name"] == "test_ladder"
+    assert data["metadata"]["model"] == "gpt-4.1-mini"
+    assert data["metadata"]["token_usage"] == {"total_tokens": 24}
+    assert any("fast-model rejected" in warning for warning in data["metadata"]["warnings"])
+
+
+def test_generate_script_endpoint_enforces_tenant_quota(monkeypatch):
+    from app.api.v1 import generation
+    from app.services.tenant_scheduler import TenantPolicy, TenantScheduler
+
+    scheduler = TenantScheduler(
+        policies={"ci": TenantPolicy(tokens_per_minute=10)},
+        api_keys={"ci-key": "ci"},
+    )
+    monkeypatch.setattr(generation, "tenant_scheduler", scheduler)
+    monkeypatch.setattr(generation, "llm_client", LadderFakeClient())
+
+    client = TestClient(app)
+    payload = {
+        "page_url": "https://example.com/checkout",
+        "output_markdown": "## Page Feedback",
+        "model": "gpt-4.1-mini",
+    }
+
+    first = client.post(
+        "/api/v1/scripts/playwright-python",
+        json=payload,
+        headers={"Authorization": "Bearer ci-key"},
+    )
+    second = client.post(
+        "/api/v1/scripts/playwright-python",
+        json=payload,
+        headers={"X-API-Key": "ci-key"},
+    )
+
+    assert first.status_code == 200
+    assert second.status_code == 429
+    assert int(second.headers["Retry-After"]) >= 1
+
+    usage = client.get("/api/v1/tenants/usage").json()
+    assert usage["tenants"]["ci"]["total_tokens"] == 24
+    assert usage["tenants"]["ci"]["upstream_calls"] == 2
+    assert usage["tenants"]["ci"]["rejected"] == 1
+
+
+def test_generate_script_endpoint_propagates_deadline_to_upstream_call(monkeypatch):
+    from app.api.v1 import generation
+    from app.services.tenant_scheduler import TenantScheduler
+
+    class RecordingClient:
+        def __init__(self):
+            self.timeouts = []
+
+        async def generate_script(self, messages, model, temperature, timeout_seconds=None):
+            self.timeouts.append(timeout_seconds)
+            return "from playwright.sync_api import Page\n\ndef test_deadline(page: Page):\n    assert page"
+
+    fake_client = RecordingClient()
+    monkeypatch.setattr(generation, "llm_client", fake_client)
+    monkeypatch.setattr(generation, "tenant_scheduler", TenantScheduler())
+
+    client = TestClient(app)
+    response = client.post(
+        "/api/v1/scripts/playwright-python",
+        json={
+            "page_url": "https://example.com/checkout",
+            "output_markdown": "## Page Feedback",
+            "generation_options": {"timeout_ms": 1500},
+        },
+    )
+
+    assert response.status_code == 200
+    assert 0 < fake_client.timeouts[0] <= 1.5
+
+
+def test_prefetch_is_consumed_once_by_the_final_generate_call(monkeypatch):
+    from app.api.v1 import generation
+    from app.services.tenant_scheduler import TenantScheduler
+
+    class CountingClient:
+        def __init__(self):
+            self.calls = 0
+
+        async def generate_script(self, messages, model, temperature, timeout_seconds=None):
+            self.calls += 1
+            await asyncio.sleep(0.05)
+            return "from playwright.sync_api import Page\n\ndef test_prefetched(page: Page):\n    assert page"
+
+    fake_client = CountingClient()
+    monkeypatch.setattr(generation, "llm_client", fake_client)
+    monkeypatch.setattr(generation, "tenant_scheduler", TenantScheduler())
+    payload = {
+        "page_url": "https://example.com/checkout",
+        "output_markdown": "## Page Feedback",
+        "annotations": [],
+    }
+
+    with TestClient(app) as client:
+        prefetch = client.post("/api/v1/scripts/playwright-python/prefetch", json=payload)
+        assert prefetch.status_code == 202
+        assert prefetch.json()["status"] == "started"
+
+        in_flight = client.post("/api/v1/scripts/playwright-python", json=payload)
+        repeated = client.post("/api/v1/scripts/playwright-python", json=payload)
+        other_markdown = client.post(
+            "/api/v1/scripts/playwright-python/prefetch",
+            json={**payload, "output_markdown": "## Page Feedback: /checkout"},
+        )
+        stats = client.get("/api/v1/scripts/playwright-python/cache").json()
+
+    assert in_flight.status_code == 200
+    assert in_flight.json()["test_name"] == "test_prefetched"
+    assert "served from generation cache" in in_flight.json()["metadata"]["warnings"]
+    assert "served from generation cache" not in repeated.json()["metadata"]["warnings"]
+    assert fake_client.calls == 3
+    assert other_markdown.json()["key"] != prefetch.json()["key"]
+    assert stats["speculative_started"] == 2
+    assert stats["entries"] == 0
+
+
+def test_generate_call_takes_over_a_queued_prefetch(monkeypatch):
+    from app.api.v1 import generation
+    from app.services.tenant_scheduler import TenantScheduler
+
+    scheduler = TenantScheduler(max_concurrency=1)
+    monkeypatch.setattr(generation, "tenant_scheduler", scheduler)
+    monkeypatch.setattr(generation, "llm_client", FakeClient())
+    payload = {"page_url": "https://example.com/checkout", "output_markdown": "## Page Feedback"}
+
+    async def run():
+        from httpx import ASGITransport, AsyncClient
+
+        async with AsyncClient(transport=ASGITransport(app=app), base_url="http://test") as client:
+            async with scheduler.slot("other"):
+                await client.post("/api/v1/scripts/playwright-python/prefetch", json=payload)
+                await asyncio.sleep(0)
+                speculation = next(iter(generation.generation_cache._tasks.values()))
+                final = asyncio.create_task(
+                    client.post("/api/v1/scripts/playwright-python", json=payload)
+                )
+                await asyncio.sleep(0.01)
+                usage = scheduler.usage_snapshot()
+            return speculation, await final, usage
+
+    speculation, response, usage = asyncio.run(run())
+
+    assert speculation.cancelled()
+    assert response.status_code == 200
+    assert "served from generation cache" not in response.json()["metadata"]["warnings"]
+    assert usage["default"]["queued"] == 1
+    assert usage["speculative"]["queued"] == 0
+
+
+def test_generate_call_waits_for_running_prefetch_only_within_its_budget(monkeypatch):
+    from app.api.v1 import generation
+    from app.services.tenant_scheduler import TenantScheduler
+
+    class SlowClient:
+        async def generate_script(self, messages, model, temperature, timeout_seconds=None):
+            await asyncio.sleep(1.0)
+            return "from playwright.sync_api import Page\n\ndef test_slow(page: Page):\n    assert page"
+
+    monkeypatch.setattr(generation, "tenant_scheduler", TenantScheduler())
+    monkeypatch.setattr(generation, "llm_client", SlowClient())
+    payload = {
+        "page_url": "https://example.com/checkout",
+        "output_markdown": "## Page Feedback",
+        "generation_options": {"timeout_ms": 300},
+    }
+
+    with TestClient(app) as client:
+        client.post(
+            "/api/v1/scripts/playwright-python/prefetch",
+            json={**payload, "generation_options": {"timeout_ms": 5000}},
+        )
+        started_at = time.monotonic()
+        response = client.post("/api/v1/scripts/playwright-python", json=payload)
+        elapsed = time.monotonic() - started_at
+
+    assert response.status_code == 504
+    assert elapsed < 0.6
+
+
+class SuiteFakeClient:
+    def __init__(self, page_delay=0.0):
+        self.page_delay = page_delay
+        self.active_pages = 0
+        self.max_active_pages = 0
+        self.page_messages = []
+
+    async def generate_script(self, messages, model, temperature, timeout_seconds=None):
+        if "conftest.py for a pytest" in messages[0]["content"]:
+            return (
+                "import pytest\n\n\n@pytest.fixture\ndef shop_page(page):\n    return page\n",
+                {"total_tokens": 10},
+                "gpt-4.1-mini",
+            )
+
+        self.page_messages.append(messages[1]["content"])
+        self.active_pages += 1
+        self.max_active_pages = max(self.max_active_pages, self.active_pages)
+        await asyncio.sleep(self.page_delay)
+        self.active_pages -= 1
+        name = "cart" if "/cart" in messages[1]["content"] else "checkout"
+        return (
+            "from playwright.sync_api import Page\n\n"
+            f"def test_{name}(shop_page: Page):\n    assert shop_page is not None\n",
+            {"total_tokens": 5},
+            "gpt-4.1-mini",
+        )
+
+
+def test_generate_suite_endpoint_builds_archive_with_shared_conftest(monkeypatch):
+    import base64
+    import io
+    import zipfile
+
+    from app.api.v1 import generation
+
+    fake = SuiteFakeClient(page_delay=0.05)
+    monkeypatch.setattr(generation, "llm_client", fake)
+    client = TestClient(app)
+
+    response = client.post(
+        "/api/v1/scripts/playwright-python/suite",
+        json={
+            "suite_name": "shop",
+            "pages": [
+                {"page_url": "https://example.com/cart"},
+                {"page_url": "https://example.com/checkout"},
+            ],
+        },
+    )
+
+    assert response.status_code == 200
+    body = response.json()
+    assert [file["path"] for file in body["files"]] == [
+        "shop/conftest.py",
+        "shop/test_cart.py",
+        "shop/test_checkout.py",
+    ]
+    assert body["files"][1]["test_name"] == "test_cart"
+    assert body["metadata"]["model"] == "gpt-4.1-mini"
+    assert body["metadata"]["warnings"] == []
+    assert body["metadata"]["token_usage"] == {"total_tokens": 20}
+    assert fake.max_active_pages == 2
+    assert all("def shop_page" in content for content in fake.page_messages)
+
+    archive = zipfile.ZipFile(io.BytesIO(base64.b64decode(body["archive_base64"])))
+    assert archive.namelist() == ["shop/conftest.py", "shop/test_cart.py", "shop/test_checkout.py"]
+    assert b"def test_checkout" in archive.read("shop/test_checkout.py")
+
+
+def test_generate_suite_endpoint_names_the_failing_page(monkeypatch):
+    from app.api.v1 import generation
+
+    class BrokenPageClient(SuiteFakeClient):
+        async def generate_script(self, messages, model, temperature, timeout_seconds=None):
+            if "/checkout" in messages[1]["content"] and "conftest_py" in messages[1]["content"]:
+                return "print('not a test')"
+            return await super().generate_script(messages, model, temperature, timeout_seconds)
+
+    monkeypatch.setattr(generation, "llm_client", BrokenPageClient())
+    client = TestClient(app)
+
+    response = client.post(
+        "/api/v1/scripts/playwright-python/suite",
+        json={
+            "pages": [
+                {"page_url": "https://example.com/cart"},
+                {"page_url": "https://example.com/checkout"},
+            ],
+        },
+    )
+
+    assert response.status_code == 422
+    assert response.json()["detail"].startswith("test_checkout.py (https://example.com/checkout)")
+
+
+def test_generate_suite_endpoint_rejects_pages_using_unknown_fixtures(monkeypatch):
+    from app.api.v1 import generation
+
+    class UnknownFixtureClient(SuiteFakeClient):
+        async def generate_script(self, messages, model, temperature, timeout_seconds=None):
+            if "conftest_py" in messages[1]["content"]:
+                return (
+                    "from playwright.sync_api import Page\n\n"
+                    "def test_cart(cart_page: Page):\n    assert cart_page\n"
+                )
+            return await super().generate_script(messages, model, temperature, timeout_seconds)
+
+    monkeypatch.setattr(generation, "llm_client", UnknownFixtureClient())
+    client = TestClient(app)
+
+    response = client.post(
+        "/api/v1/scripts/playwright-python/suite",
+        json={"pages": [{"page_url": "https://example.com/cart"}]},
+    )
+
+    assert response.status_code == 422
+    assert "test_cart uses 'cart_page'" in response.json()["detail"]
+
+
+def test_early_stopped_streams_are_debited_from_tenant_quota(monkeypatch):
+    from app.api.v1 import generation
+    from app.services.llm_client import LLMConfig, OpenAICompatibleLLMClient
+    from app.services.tenant_scheduler import TenantPolicy, TenantScheduler
+    from tests.test_llm_client import FakeStream, FakeStreamingResponsesAPI, _stream_events
+
+    responses = FakeStreamingResponsesAPI([FakeStream(_stream_events()) for _ in range(2)])
+    monkeypatch.setattr(
+        "app.services.llm_client.OpenAI",
+        lambda **kwargs: SimpleNamespace(responses=responses),
+    )
+    llm_client = OpenAICompatibleLLMClient(
+        LLMConfig(
+            base_url="https://api.openai.com/v1",
+            api_key="test-key",
+            model="stream-model",
+            early_stop=True,
+            early_stop_calibration_every=0,
+        )
+    )
+    scheduler = TenantScheduler(
+        policies={"ci": TenantPolicy(tokens_per_minute=10)},
+        api_keys={"ci-key": "ci"},
+    )
+    monkeypatch.setattr(generation, "llm_client", llm_client)
+    monkeypatch.setattr(generation, "tenant_scheduler", scheduler)
+    client = TestClient(app)
+    payload = {"page_url": "https://example.com/checkout", "output_markdown": "## Page Feedback"}
+
+    headers = {"X-API-Key": "ci-key"}
+    first = client.post("/api/v1/scripts/playwright-python", json=payload, headers=headers)
+    second = client.post("/api/v1/scripts/playwright-python", json=payload, headers=headers)
+
+    assert first.status_code == 200
+    assert "estimated" in first.json()["metadata"]["token_usage"]
+    assert second.status_code == 429
+    usage = client.get("/api/v1/tenants/usage").json()["tenants"]["ci"]
+    assert usage["total_tokens"] == 0
+    assert usage["estimated_tokens"] > 10
@@ -0,0 +1,109 @@
+import asyncio
+
+from app.services.generation_cache import GenerationCache, canonical_request_key
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def _key(**overrides):
+    arguments = {
+        "messages": [{"role": "user", "content": "## Page Feedback"}],
+        "tenant": "team",
+        "model": None,
+        "temperature": None,
+    }
+    arguments.update(overrides)
+    return canonical_request_key(arguments.pop("messages"), **arguments)
+
+
+def test_canonical_request_key_covers_messages_tenant_and_model():
+    base = _key()
+
+    assert _key() == base
+    assert _key(messages=[{"role": "user", "content": "### other"}]) != base
+    assert _key(tenant="other-team") != base
+    assert _key(model="gpt-4.1") != base
+    assert _key(temperature=0.5) != base
+
+
+def test_take_consumes_entries():
+    cache = GenerationCache()
+
+    cache.put("a", 1)
+
+    assert cache.take("a") == 1
+    assert cache.take("a") is None
+    assert cache.stats()["entries"] == 0
+
+
+def test_cache_expires_entries_and_evicts_least_recently_used():
+    clock = FakeClock()
+    cache = GenerationCache(ttl_seconds=10, max_entries=2, clock=clock)
+
+    cache.put("a", 1)
+    cache.put("b", 2)
+    assert cache.get("a") == 1
+    cache.put("c", 3)
+
+    assert cache.get("b") is None
+    assert cache.get("a") == 1
+    clock.now = 11
+    assert cache.get("a") is None
+    assert cache.stats()["hits"] == 2
+
+
+def test_speculative_generation_is_superseded_and_capped():
+    cache = GenerationCache(max_speculative=1)
+    superseded = []
+
+    async def run():
+        release = asyncio.Event()
+
+        async def slow(value):
+            await release.wait()
+            return value
+
+        assert cache.start_speculative("k1", "page-1", lambda: slow("v1")) == "started"
+        assert cache.start_speculative("k1", "page-1", lambda: slow("v1")) == "in_flight"
+        superseded.append(cache.in_flight("k1"))
+        assert cache.start_speculative("k2", "page-1", lambda: slow("v2")) == "started"
+        assert cache.start_speculative("k3", "page-2", lambda: slow("v3")) == "skipped"
+
+        task = cache.in_flight("k2")
+        release.set()
+        await task
+        await asyncio.sleep(0)
+
+        assert cache.start_speculative("k2", "page-1", lambda: slow("v2")) == "cached"
+
+    asyncio.run(run())
+
+    assert superseded[0].cancelled()
+    assert cache.get("k2") == "v2"
+    assert cache.get("k1") is None
+    stats = cache.stats()
+    assert stats["speculative_superseded"] == 1
+    assert stats["speculative_skipped"] == 1
+    assert stats["speculative_in_flight"] == 0
+
+
+def test_failed_speculative_generation_is_not_cached():
+    cache = GenerationCache()
+
+    async def failing():
+        raise RuntimeError("upstream down")
+
+    async def run():
+        cache.start_speculative("k", "page", failing)
+        assert await cache.in_flight("k") is None
+
+    asyncio.run(run())
+
+    assert cache.get("k") is None
+    assert cache.stats()["speculative_failed"] == 1
@@ -1,6 +1,8 @@
 import asyncio
 from types import SimpleNamespace
 
+import pytest
+
 from app.services.llm_client import LLMConfig, OpenAICompatibleLLMClient
 
 
@@ -150,3 +152,204 @@ def test_generate_script_extracts_refusal_text_from_responses_payload(monkeypatc
     assert script == "request rejected"
     assert usage == {"total_tokens": 9}
     assert model_name == "qwen-plus"
+
+
+def test_generate_script_caps_upstream_timeout_at_remaining_budget(monkeypatch):
+    FakeOpenAI.instances = []
+    FakeOpenAI.response_obj = {"output": [{"text": "ok"}], "model": "qwen-plus"}
+    monkeypatch.setattr("app.services.llm_client.OpenAI", FakeOpenAI)
+
+    client = OpenAICompatibleLLMClient(
+        LLMConfig(
+            base_url="https://api.openai.com/v1",
+            api_key="test-key",
+            model="qwen-plus",
+            timeout_seconds=30,
+        )
+    )
+
+    asyncio.run(
+        client.generate_script(
+            messages=[{"role": "user", "content": "hello"}],
+            model=None,
+            temperature=None,
+            timeout_seconds=2.5,
+        )
+    )
+    asyncio.run(
+        client.generate_script(
+            messages=[{"role": "user", "content": "hello"}],
+            model=None,
+            temperature=None,
+            timeout_seconds=120,
+        )
+    )
+
+    calls = FakeOpenAI.instances[0].responses.calls
+    assert calls[0]["timeout"] == 2.5
+    assert calls[1]["timeout"] == 30
+
+
+def test_extract_responses_content_dumps_sdk_objects_once():
+    class DumpCountingResponse:
+        dumps = 0
+
+        def model_dump(self):
+            DumpCountingResponse.dumps += 1
+            return {
+                "output": [
+                    {"type": "reasoning", "summary": []},
+                    {"type": "message", "content": [{"type": "output_text", "text": "script"}]},
+                ]
+            }
+
+    content = OpenAICompatibleLLMClient._extract_responses_content(DumpCountingResponse())
+
+    assert content == "script"
+    assert DumpCountingResponse.dumps == 1
+
+
+class FakeStream:
+    def __init__(self, events):
+        self._events = iter(events)
+        self.consumed = 0
+        self.closed = False
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        event = next(self._events)
+        self.consumed += 1
+        return event
+
+    def close(self):
+        self.closed = True
+
+
+class FakeStreamingResponsesAPI:
+    def __init__(self, streams):
+        self._streams = list(streams)
+        self.calls = []
+        self.returned = []
+
+    def create(self, **kwargs):
+        self.calls.append(kwargs)
+        stream = self._streams.pop(0)
+        self.returned.append(stream)
+        return stream
+
+
+def _delta(text):
+    return SimpleNamespace(type="response.output_text.delta", delta=text)
+
+
+def _stream_events(trailing="\n\nThis test checks the page.\n```python\nprint('extra')\n```"):
+    body = "```python\nfrom playwright.sync_api import Page\n\ndef test_s(page: Page):\n    assert page\n"
+    completed = SimpleNamespace(
+        output_text=body + "```" + trailing,
+        usage=SimpleNamespace(model_dump=lambda: {"input_tokens": 50, "output_tokens": 40}),
+        model="stream-model-0419",
+    )
+    return [
+        SimpleNamespace(type="response.created", response=SimpleNamespace(model="stream-model-0419")),
+        _delta("Here you go:\n"),
+        _delta(body[:20]),
+        _delta(body[20:]),
+        _delta("``"),
+        _delta("`"),
+        _delta(trailing),
+        SimpleNamespace(type="response.completed", response=completed),
+    ]
+
+
+def _streaming_client(monkeypatch, streams, **config):
+    responses = FakeStreamingResponsesAPI(streams)
+    monkeypatch.setattr(
+        "app.services.llm_client.OpenAI",
+        lambda **kwargs: SimpleNamespace(responses=responses),
+    )
+    client = OpenAICompatibleLLMClient(
+        LLMConfig(
+            base_url="https://api.openai.com/v1",
+            api_key="test-key",
+            model="stream-model",
+            **{"early_stop": True, **config},
+        )
+    )
+    return client, responses
+
+
+def _generate(client):
+    return asyncio.run(
+        client.generate_script(
+            messages=[{"role": "user", "content": "hello"}],
+            model=None,
+            temperature=None,
+        )
+    )
+
+
+def test_generate_script_closes_stream_at_closing_code_fence(monkeypatch):
+    client, responses = _streaming_client(
+        monkeypatch,
+        [FakeStream(_stream_events())],
+        early_stop_calibration_every=0,
+        max_output_tokens=800,
+        stop_sequences=("\n```\n",),
+    )
+
+    script, usage, model_name = _generate(client)
+
+    call = responses.calls[0]
+    assert call["stream"] is True
+    assert call["max_output_tokens"] == 800
+    assert call["extra_body"] == {"stop": ["\n```\n"]}
+    stream = responses.returned[0]
+    assert stream.closed
+    assert stream.consumed == 6
+    assert script.endswith("assert page\n```")
+    assert "extra" not in script
+    assert model_name == "stream-model-0419"
+    assert usage["early_stop"]["stopped"] is True
+    assert "total_tokens" not in usage
+    estimated = usage["estimated"]
+    assert estimated["total_tokens"] == estimated["input_tokens"] + estimated["output_tokens"]
+    assert client.early_stop_stats.snapshot()["early_stops"] == 1
+
+
+def test_calibration_stream_runs_to_completion_and_feeds_savings_estimate(monkeypatch):
+    client, responses = _streaming_client(
+        monkeypatch,
+        [FakeStream(_stream_events()) for _ in range(3)],
+        early_stop_calibration_every=2,
+    )
+
+    first = _generate(client)
+    second = _generate(client)
+    third = _generate(client)
+
+    assert first[1]["early_stop"]["calibrated"] is False
+    assert first[1]["early_stop"]["estimated_tokens_saved"] == 0
+    assert "print('extra')" in second[0]
+    assert second[1] == {"input_tokens": 50, "output_tokens": 40}
+    assert responses.returned[1].consumed == 8
+    assert third[1]["early_stop"]["calibrated"] is True
+    assert third[1]["early_stop"]["estimated_tokens_saved"] > 0
+
+    snapshot = client.early_stop_stats.snapshot()
+    assert snapshot["streams"] == 3
+    assert snapshot["early_stops"] == 2
+    assert snapshot["calibration_samples"] == 1
+    assert snapshot["estimated_tokens_saved"] == third[1]["early_stop"]["estimated_tokens_saved"]
+
+
+def test_generate_script_raises_on_failed_stream(monkeypatch):
+    failed = SimpleNamespace(
+        type="response.failed",
+        response=SimpleNamespace(error=SimpleNamespace(message="model overloaded")),
+    )
+    client, _ = _streaming_client(monkeypatch, [FakeStream([_delta("partial"), failed])])
+
+    with pytest.raises(RuntimeError, match="model overloaded"):
+        _generate(client)
@@ -0,0 +1,99 @@
+import asyncio
+
+import pytest
+
+from app.services.model_ladder import generate_with_model_ladder, resolve_model_ladder
+from app.services.script_validator import ScriptValidationError
+
+GOOD_SCRIPT = (
+    "from playwright.sync_api import Page, expect\n\n"
+    "def test_ok(page: Page):\n"
+    "    expect(page).to_have_title('Home')"
+)
+WEAK_SCRIPT = "from playwright.sync_api import Page\n\ndef test_weak(page: Page):\n    pass"
+
+
+def test_resolve_model_ladder_uses_requested_model_as_ceiling():
+    ladder = ("nano", "mini", "large")
+
+    assert resolve_model_ladder(ladder, None) == ["nano", "mini", "large"]
+    assert resolve_model_ladder(ladder, "mini") == ["nano", "mini"]
+    assert resolve_model_ladder(ladder, "custom") == ["custom"]
+    assert resolve_model_ladder((), "mini") == ["mini"]
+    assert resolve_model_ladder((), None) == [None]
+
+
+def test_generate_with_model_ladder_stops_at_first_acceptable_model():
+    calls = []
+
+    async def generate(model):
+        calls.append(model)
+        return GOOD_SCRIPT, {"total_tokens": 10}, model
+
+    result = asyncio.run(generate_with_model_ladder(generate, ["nano", "mini"]))
+
+    assert calls == ["nano"]
+    assert result.model == "nano"
+    assert result.warnings == []
+
+
+def test_generate_with_model_ladder_escalates_on_invalid_and_weak_scripts():
+    outputs = {
+        "nano": ("print('hello')", {"total_tokens": 5}, "nano"),
+        "mini": (WEAK_SCRIPT, {"total_tokens": 7}, "mini"),
+        "large": (GOOD_SCRIPT, {"total_tokens": 11}, "large"),
+    }
+
+    async def generate(model):
+        return outputs[model]
+
+    result = asyncio.run(
+        generate_with_model_ladder(generate, ["nano", "mini", "large"], min_assertions=1)
+    )
+
+    assert result.model == "large"
+    assert "def test_ok" in result.script
+    assert result.token_usage == {"total_tokens": 23}
+    assert len(result.warnings) == 3
+    assert "attempt 1 with nano rejected" in result.warnings[0]
+    assert "attempt 2 with mini rejected (only 0 assertion(s)" in result.warnings[1]
+    assert "escalated to large" in result.warnings[2]
+
+
+def test_generate_with_model_ladder_accepts_weak_script_from_last_model():
+    async def generate(model):
+        return WEAK_SCRIPT
+
+    result = asyncio.run(generate_with_model_ladder(generate, ["mini"], min_assertions=3))
+
+    assert "def test_weak" in result.script
+    assert result.model == "mini"
+    assert result.token_usage is None
+
+
+def test_generate_with_model_ladder_raises_when_last_model_is_invalid():
+    async def generate(model):
+        return "print('hello')"
+
+    with pytest.raises(ScriptValidationError):
+        asyncio.run(generate_with_model_ladder(generate, ["nano", "mini"]))
+
+
+def test_generate_with_model_ladder_falls_back_to_weak_script_when_last_model_is_invalid():
+    outputs = {
+        "nano": (WEAK_SCRIPT, {"total_tokens": 5}, "nano"),
+        "mini": ("print('hello')", {"total_tokens": 7}, "mini"),
+    }
+
+    async def generate(model):
+        return outputs[model]
+
+    result = asyncio.run(generate_with_model_ladder(generate, ["nano", "mini"]))
+
+    assert "def test_weak" in result.script
+    assert result.test_name == "test_weak"
+    assert result.model == "nano"
+    assert result.token_usage == {"total_tokens": 12}
+    assert "attempt 1 with nano rejected (only 0 assertion(s)" in result.warnings[0]
+    assert "attempt 2 with mini rejected" in result.warnings[1]
+    assert "falling back to attempt 1 with nano" in result.warnings[2]
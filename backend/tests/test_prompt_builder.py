@@ -1,4 +1,4 @@
-from app.services.prompt_builder import build_generation_messages
+from app.services.prompt_builder import build_generation_messages, build_suite_page_messages
 
 
 def test_build_generation_messages_contains_contract():
@@ -12,3 +12,17 @@ def test_build_generation_messages_contains_contract():
     assert "playwright.sync_api" in messages[0]["content"]
     assert "pytest" in messages[0]["content"]
     assert "https://example.com" in messages[1]["content"]
+
+
+def test_build_suite_page_messages_includes_shared_conftest():
+    messages = build_suite_page_messages(
+        page_url="https://example.com/cart",
+        output_markdown="",
+        annotations=[],
+        conftest_source="import pytest",
+        module_name="test_cart",
+    )
+
+    assert "conftest.py" in messages[0]["content"]
+    assert "import pytest" in messages[1]["content"]
+    assert "test_cart" in messages[1]["content"]
@@ -1,6 +1,13 @@
 import pytest
 
-from app.services.script_validator import ScriptValidationError, validate_and_extract_script
+from app.services.script_validator import (
+    CODE_BLOCK_RE,
+    ScriptValidationError,
+    _unwrap_code_fence,
+    count_assertions,
+    validate_and_extract_script,
+    validate_and_extract_script_with_name,
+)
 
 
 def test_validate_and_extract_script_accepts_plain_script():
@@ -20,3 +27,54 @@ def test_validate_and_extract_script_unwraps_fenced_block():
 def test_validate_and_extract_script_rejects_invalid_payload():
     with pytest.raises(ScriptValidationError):
         validate_and_extract_script("print('hello')")
+
+
+def test_count_assertions_counts_assert_and_expect_statements():
+    script = (
+        "from playwright.sync_api import Page, expect\n\n"
+        "def test_x(page: Page):\n"
+        "    assert page.title()\n"
+        "    expect(page.locator('h1')).to_be_visible()\n"
+        "    # assert in a comment is ignored\n"
+    )
+
+    assert count_assertions(script) == 2
+
+
+@pytest.mark.parametrize(
+    "text",
+    [
+        "plain script",
+        "```python\nbody\n```",
+        "prose ```PYTHON body``` more ```python other```",
+        "```pythonic```",
+        "``````",
+        "````python x```",
+        "``` a ``` b ```",
+        "  ```\n```  ",
+    ],
+)
+def test_unwrap_code_fence_matches_code_block_regex(text):
+    match = CODE_BLOCK_RE.search(text)
+    expected = match.group(1).strip() if match else text.strip()
+
+    assert _unwrap_code_fence(text) == expected
+
+
+def test_unwrap_code_fence_handles_output_cut_at_the_stop_sequence():
+    text = "Here you go:\n```python\nfrom playwright.sync_api import Page\n\ndef test_z(page: Page):\n    assert page"
+
+    script, test_name = validate_and_extract_script_with_name(text)
+
+    assert script == "from playwright.sync_api import Page\n\ndef test_z(page: Page):\n    assert page"
+    assert test_name == "test_z"
+    assert _unwrap_code_fence("```python") == ""
+
+
+def test_validate_and_extract_script_with_name_returns_test_name():
+    script, test_name = validate_and_extract_script_with_name(
+        "Sure!\n```python\nfrom playwright.sync_api import Page\n\ndef test_y(page: Page):\n    pass\n```\nDone."
+    )
+
+    assert script.startswith("from playwright.sync_api")
+    assert test_name == "test_y"
@@ -0,0 +1,122 @@
+import io
+import zipfile
+
+import pytest
+
+from app.services.script_validator import ScriptValidationError
+from app.services.suite_builder import (
+    build_suite_archive,
+    check_suite,
+    module_name_for_page,
+    suite_directory_name,
+    suite_module_validator,
+    validate_conftest,
+)
+
+CONFTEST = """```python
+import pytest
+
+
+@pytest.fixture
+def signed_in_page(page):
+    page.goto("https://example.com/login")
+    return page
+```"""
+
+
+def test_module_name_for_page_slugifies_and_deduplicates():
+    used = set()
+
+    assert module_name_for_page("https://example.com/", used) == "test_home"
+    assert module_name_for_page("https://example.com/cart/checkout?x=1", used) == "test_cart_checkout"
+    assert module_name_for_page("https://example.com/cart/checkout#pay", used) == "test_cart_checkout_2"
+
+
+def test_suite_directory_name_is_an_identifier():
+    assert suite_directory_name("Checkout flow!") == "checkout_flow"
+    assert suite_directory_name("2024 suite") == "_2024_suite"
+    assert suite_directory_name("!!!") == "playwright_suite"
+
+
+def test_validate_conftest_requires_a_fixture():
+    source, test_name = validate_conftest(CONFTEST)
+
+    assert source.startswith("import pytest")
+    assert test_name == ""
+    with pytest.raises(ScriptValidationError, match="fixture"):
+        validate_conftest("import pytest\n")
+    with pytest.raises(ScriptValidationError, match="not valid Python"):
+        validate_conftest("def broken(:\n    pass")
+
+
+def test_suite_module_validator_rejects_syntax_errors():
+    validate = suite_module_validator(validate_conftest(CONFTEST)[0])
+
+    script, test_name = validate(
+        "from playwright.sync_api import Page\n\ndef test_cart(page: Page):\n    assert page"
+    )
+
+    assert test_name == "test_cart"
+    assert script.endswith("assert page")
+    with pytest.raises(ScriptValidationError, match="test_cart.py"):
+        validate("from playwright.sync_api import Page\n\ndef test_cart(page:\n")
+
+
+def test_suite_module_validator_rejects_unknown_fixtures_in_functions_and_classes():
+    validate = suite_module_validator(validate_conftest(CONFTEST)[0])
+    header = "import pytest\nfrom playwright.sync_api import Page\n\n"
+
+    validate(
+        header
+        + "@pytest.fixture\ndef cart(page):\n    return page\n\n"
+        + "@pytest.mark.parametrize('qty', [1, 2])\n"
+        + "def test_cart(signed_in_page, cart, qty):\n    assert cart\n\n"
+        + "@pytest.mark.parametrize(('size', 'color'), [('s', 'red')])\n"
+        + "class TestCart:\n    def test_item(self, page, size, color):\n        assert page\n"
+    )
+    with pytest.raises(ScriptValidationError, match="test_cart uses 'cart_page'"):
+        validate(header + "def test_cart(cart_page):\n    assert cart_page\n")
+    with pytest.raises(ScriptValidationError, match="TestCart.test_item uses 'basket'"):
+        validate(
+            header
+            + "class TestCart:\n    def test_item(self, page, basket):\n        assert basket\n"
+        )
+
+
+def test_suite_module_validator_accepts_renamed_and_builtin_fixtures():
+    conftest = (
+        "import pytest\n\n\n"
+        "@pytest.fixture(name='shop')\ndef shop_fixture(new_context):\n    return new_context()\n"
+    )
+    validate = suite_module_validator(validate_conftest(conftest)[0])
+    header = "import pytest\nfrom playwright.sync_api import Page\n\n"
+
+    validate(
+        header
+        + "@pytest.fixture(scope='module', name='cart')\ndef _cart(shop):\n    return shop\n\n"
+        + "def test_cart(shop, cart, browser_channel, device, output_path, tmpdir, capfd, recwarn):\n"
+        + "    assert cart\n"
+    )
+    with pytest.raises(ScriptValidationError, match="test_cart uses '_cart'"):
+        validate(
+            header
+            + "@pytest.fixture(name='cart')\ndef _cart(shop):\n    return shop\n\n"
+            + "def test_cart(_cart):\n    assert _cart\n"
+        )
+
+
+def test_check_suite_warns_about_duplicate_tests():
+    modules = {
+        "test_login": "def test_flow(signed_in_page, page):\n    assert signed_in_page",
+        "test_cart": "class TestCart:\n    def test_flow(self):\n        pass\n\ndef test_flow(page):\n    assert page",
+    }
+
+    assert check_suite(modules) == ["test_cart.py: test_flow is also defined in test_login.py"]
+
+
+def test_build_suite_archive_writes_files_under_directory():
+    archive = build_suite_archive("suite", {"conftest.py": "import pytest", "test_home.py": "x = 1\n\n"})
+
+    with zipfile.ZipFile(io.BytesIO(archive)) as bundle:
+        assert bundle.namelist() == ["suite/conftest.py", "suite/test_home.py"]
+        assert bundle.read("suite/test_home.py") == b"x = 1\n"
@@ -0,0 +1,276 @@
+import asyncio
+from pathlib import Path
+
+import pytest
+
+from app.services.tenant_scheduler import (
+    DeadlineExceededError,
+    QuotaExceededError,
+    SERVICE_TIME_HALF_LIFE_SECONDS,
+    TenantPolicy,
+    TenantScheduler,
+    TokenBucket,
+    extract_token_counts,
+)
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def test_scheduler_admits_higher_weight_tenant_first_under_contention():
+    scheduler = TenantScheduler(
+        max_concurrency=1,
+        policies={
+            "batch": TenantPolicy(weight=1.0),
+            "interactive": TenantPolicy(weight=4.0),
+        },
+    )
+    order = []
+
+    async def run():
+        release_holder = asyncio.Event()
+
+        async def holder():
+            async with scheduler.slot("holder"):
+                await release_holder.wait()
+
+        async def worker(tenant, index):
+            async with scheduler.slot(tenant):
+                order.append(f"{tenant}-{index}")
+
+        holder_task = asyncio.create_task(holder())
+        await asyncio.sleep(0)
+        tasks = [asyncio.create_task(worker("batch", i)) for i in range(3)]
+        await asyncio.sleep(0)
+        tasks += [asyncio.create_task(worker("interactive", i)) for i in range(2)]
+        await asyncio.sleep(0)
+        assert scheduler.usage_snapshot()["batch"]["queued"] == 3
+
+        release_holder.set()
+        await asyncio.gather(holder_task, *tasks)
+
+    asyncio.run(run())
+
+    assert order[:2] == ["interactive-0", "interactive-1"]
+    assert order[2:] == ["batch-0", "batch-1", "batch-2"]
+
+
+def test_scheduler_releases_slot_when_waiter_is_cancelled():
+    scheduler = TenantScheduler(max_concurrency=1)
+
+    async def run():
+        async with scheduler.slot("a"):
+            waiter = asyncio.create_task(scheduler.slot("b").__aenter__())
+            await asyncio.sleep(0)
+            waiter.cancel()
+            with pytest.raises(asyncio.CancelledError):
+                await waiter
+
+        async with scheduler.slot("c"):
+            assert scheduler.usage_snapshot()["c"]["in_flight"] == 1
+
+    asyncio.run(asyncio.wait_for(run(), timeout=1))
+
+
+def test_token_bucket_refills_after_debt():
+    clock = FakeClock()
+    bucket = TokenBucket(capacity=60, refill_per_second=1.0, clock=clock)
+
+    bucket.consume(90)
+    assert bucket.available() == -30
+    assert bucket.seconds_until_available() == 31
+
+    clock.now = 40
+    assert bucket.available() == 10
+
+
+def test_check_quota_rejects_tenant_after_usage_exhausts_bucket():
+    clock = FakeClock()
+    scheduler = TenantScheduler(
+        policies={"ci": TenantPolicy(tokens_per_minute=100)},
+        clock=clock,
+    )
+
+    scheduler.check_quota("ci")
+    scheduler.record_usage("ci", {"input_tokens": 80, "output_tokens": 40, "total_tokens": 120})
+
+    with pytest.raises(QuotaExceededError) as error:
+        scheduler.check_quota("ci")
+    assert error.value.retry_after_seconds > 0
+
+    scheduler.check_quota("interactive")
+    snapshot = scheduler.usage_snapshot()
+    assert snapshot["ci"]["requests"] == 1
+    assert snapshot["ci"]["rejected"] == 1
+    assert snapshot["ci"]["prompt_tokens"] == 80
+    assert snapshot["ci"]["completion_tokens"] == 40
+    assert snapshot["ci"]["quota_remaining"] == 0
+    assert snapshot["interactive"]["quota_remaining"] is None
+
+
+def test_extract_token_counts_supports_chat_usage_keys():
+    assert extract_token_counts({"prompt_tokens": 3, "completion_tokens": 4}) == (3, 4, 7)
+    assert extract_token_counts(None) == (0, 0, 0)
+
+
+def test_from_env_parses_tenant_policies(monkeypatch, tmp_path: Path):
+    env_file = tmp_path / ".env"
+    env_file.write_text(
+        "\n".join(
+            [
+                "LLM_MAX_CONCURRENCY=8",
+                "TENANT_WEIGHTS=interactive:4,ci:1,*:2",
+                "TENANT_TOKEN_QUOTAS=ci:50000",
+                "TENANT_API_KEYS=key-ci:ci,key-ext:interactive",
+                "TENANT_HEADER_ALLOWLIST=team-x",
+                "TENANT_MAX_TRACKED=10",
+            ]
+        ),
+        encoding="utf-8",
+    )
+    monkeypatch.setenv("AGENTATION_ENV_FILE", str(env_file))
+
+    scheduler = TenantScheduler.from_env()
+
+    assert scheduler.max_concurrency == 8
+    assert scheduler.policy_for("interactive").weight == 4.0
+    assert scheduler.policy_for("ci").tokens_per_minute == 50000
+    assert scheduler.policy_for("other").weight == 2.0
+    assert scheduler.resolve_tenant(api_key="key-ci", tenant_header="spoofed") == "ci"
+    assert scheduler.resolve_tenant(api_key="unknown", tenant_header="team-x") == "team-x"
+    assert scheduler.resolve_tenant(tenant_header="interactive") == "default"
+    assert scheduler.resolve_tenant() == "default"
+    assert scheduler.max_tenants == 10
+
+
+def test_resolve_tenant_bounds_header_tenants_without_api_keys():
+    scheduler = TenantScheduler(max_tenants=2)
+
+    assert scheduler.resolve_tenant(tenant_header="speculative") == "default"
+    for tenant in ("a", "b"):
+        assert scheduler.resolve_tenant(tenant_header=tenant) == tenant
+        scheduler.check_quota(tenant)
+
+    assert scheduler.resolve_tenant(tenant_header="a") == "a"
+    assert scheduler.resolve_tenant(tenant_header="c") == "default"
+
+
+def test_scheduler_admits_waiters_earliest_deadline_first_within_tenant():
+    clock = FakeClock()
+    scheduler = TenantScheduler(max_concurrency=1, clock=clock)
+    order = []
+
+    async def run():
+        release_holder = asyncio.Event()
+
+        async def holder():
+            async with scheduler.slot("team"):
+                await release_holder.wait()
+
+        async def worker(name, deadline):
+            async with scheduler.slot("team", deadline=deadline):
+                order.append(name)
+
+        holder_task = asyncio.create_task(holder())
+        await asyncio.sleep(0)
+        tasks = [
+            asyncio.create_task(worker("late", 30.0)),
+            asyncio.create_task(worker("none", None)),
+            asyncio.create_task(worker("early", 10.0)),
+        ]
+        await asyncio.sleep(0)
+        release_holder.set()
+        await asyncio.gather(holder_task, *tasks)
+
+    asyncio.run(run())
+
+    assert order == ["early", "late", "none"]
+
+
+def test_scheduler_drops_queued_waiters_whose_budget_is_below_expected_service_time():
+    clock = FakeClock()
+    scheduler = TenantScheduler(max_concurrency=1, clock=clock)
+
+    async def run():
+        async with scheduler.slot("team", service_key="slow-model"):
+            clock.now = 5.0
+        assert scheduler.expected_service_seconds("slow-model") == 5.0
+        assert scheduler.expected_service_seconds("fast-model") == 0.0
+
+        # A free slot admits the call regardless of the estimate.
+        async with scheduler.slot("team", deadline=clock.now + 2.0, service_key="slow-model"):
+            pass
+
+        release_holder = asyncio.Event()
+
+        async def holder():
+            async with scheduler.slot("team"):
+                await release_holder.wait()
+                clock.now += 1.0
+
+        async def waiter(deadline, service_key):
+            async with scheduler.slot("team", deadline=deadline, service_key=service_key):
+                pass
+
+        holder_task = asyncio.create_task(holder())
+        await asyncio.sleep(0)
+        with pytest.raises(DeadlineExceededError):
+            await waiter(clock.now + 2.0, "slow-model")
+        fast_task = asyncio.create_task(waiter(clock.now + 2.0, "fast-model"))
+        await asyncio.sleep(0)
+        release_holder.set()
+        await asyncio.gather(holder_task, fast_task)
+
+    asyncio.run(run())
+
+    assert scheduler.usage_snapshot()["team"]["dropped"] == 1
+    assert scheduler.usage_snapshot()["team"]["in_flight"] == 0
+
+
+def test_expected_service_time_decays_without_new_observations():
+    clock = FakeClock()
+    scheduler = TenantScheduler(clock=clock)
+
+    async def run():
+        async with scheduler.slot("team"):
+            clock.now = 10.0
+
+    asyncio.run(run())
+    clock.now += SERVICE_TIME_HALF_LIFE_SECONDS
+
+    assert scheduler.expected_service_seconds() == pytest.approx(5.0)
+
+
+def test_waiter_dropped_and_cancelled_in_the_same_tick_does_not_release_a_slot():
+    clock = FakeClock()
+    scheduler = TenantScheduler(max_concurrency=1, clock=clock)
+
+    async def run():
+        async with scheduler.slot("team", service_key="model"):
+            clock.now = 5.0
+
+        async def waiter():
+            async with scheduler.slot("team", deadline=clock.now + 6.0, service_key="model"):
+                pass
+
+        holder = scheduler.slot("team")
+        await holder.__aenter__()
+        waiter_task = asyncio.create_task(waiter())
+        await asyncio.sleep(0)
+        clock.now += 2.0
+        # Releasing drops the waiter; it is cancelled before it gets to run.
+        await holder.__aexit__(None, None, None)
+        waiter_task.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await waiter_task
+
+        assert scheduler._active == 0
+
+    asyncio.run(run())
+
+    assert scheduler.usage_snapshot()["team"]["dropped"] == 1
@@ -0,0 +1,166 @@
+import asyncio
+from pathlib import Path
+
+from fastapi.testclient import TestClient
+
+from app.main import app
+from app.services.generation_cache import GenerationCache
+from app.services.traffic_capture import TrafficRecorder, read_capture, sanitize_payload
+from app.tools import replay_traffic
+
+SCRIPT = (
+    "from playwright.sync_api import Page\n\ndef test_captured(page: Page):\n"
+    "    page.goto('https://example.com/checkout?token=secret')\n    assert page"
+)
+
+
+class CapturingFakeClient:
+    model_ladder = ()
+    ladder_min_assertions = 1
+
+    async def generate_script(self, messages, model, temperature, timeout_seconds=None):
+        await asyncio.sleep(0.01)
+        return SCRIPT, {"total_tokens": 42}, "upstream-model"
+
+
+def test_sanitize_payload_redacts_credentials_query_strings_and_emails():
+    value = sanitize_payload(
+        {
+            "page_url": "https://user:pw@example.com:8443/account?session=abc#top",
+            "output_markdown": "## Page Feedback: https://example.com/a?token=s\nContact jane.doe@example.com",
+            "annotations": [{"comment": "ok", "api_key": "sk-123", "authToken": "t"}],
+        }
+    )
+
+    assert value["page_url"] == "https://example.com:8443/account"
+    assert value["output_markdown"] == (
+        "## Page Feedback: https://example.com/a\nContact [redacted]"
+    )
+    assert value["annotations"][0] == {
+        "comment": "ok",
+        "api_key": "[redacted]",
+        "authToken": "[redacted]",
+    }
+
+
+def test_recorder_appends_gzip_jsonl_off_the_request_path(tmp_path: Path):
+    path = tmp_path / "capture" / "traffic.jsonl.gz"
+    recorder = TrafficRecorder(path)
+
+    recorder.record({"n": 1})
+    recorder.close()
+    recorder.record({"n": 2})
+    recorder.close()
+
+    assert [entry["n"] for entry in read_capture(path)] == [1, 2]
+
+
+def test_disabled_recorder_does_not_start_sessions():
+    recorder = TrafficRecorder(None)
+
+    assert recorder.start({"page_url": "https://example.com"}, tenant="default") is None
+
+
+def test_captured_traffic_replays_against_stub_upstream(monkeypatch, tmp_path: Path):
+    from app.api.v1 import generation
+
+    path = tmp_path / "traffic.jsonl.gz"
+    recorder = TrafficRecorder(path)
+    monkeypatch.setattr(generation, "traffic_recorder", recorder)
+    monkeypatch.setattr(generation, "llm_client", CapturingFakeClient())
+    monkeypatch.setattr(generation, "generation_cache", GenerationCache())
+
+    client = TestClient(app)
+    for page in ("checkout", "cart"):
+        response = client.post(
+            "/api/v1/scripts/playwright-python",
+            json={
+                "page_url": f"https://example.com/{page}?token=secret",
+                "output_markdown": "## Page Feedback",
+                "annotations": [],
+            },
+            headers={"X-Tenant-ID": "team-a"},
+        )
+        assert response.status_code == 200
+    recorder.close()
+
+    entries = list(read_capture(path))
+    assert len(entries) == 2
+    assert entries[0]["tenant"] == "team-a"
+    assert entries[0]["status"] == 200
+    assert entries[0]["request"]["page_url"] == "https://example.com/checkout"
+    assert entries[0]["upstream"][0]["model"] == "upstream-model"
+    assert entries[0]["upstream"][0]["text"] == SCRIPT.replace("?token=secret", "")
+    assert entries[0]["upstream"][0]["duration_ms"] > 0
+
+    results = asyncio.run(replay_traffic.replay(entries, speed=0))
+    summary = replay_traffic.summarize(results)
+
+    assert generation.traffic_recorder is recorder
+    assert summary["requests"] == 2
+    assert summary["status_counts"] == {"200": 2}
+    assert summary["latency_ms"]["p50"] is not None
+    assert len(list(read_capture(path))) == 2
+
+
+def test_disabled_recorder_skips_request_serialization(monkeypatch):
+    from app.api.v1 import generation
+    from app.models.schemas import GenerateScriptRequest
+
+    def fail_model_dump(self, **kwargs):
+        raise AssertionError("request serialized with capture disabled")
+
+    monkeypatch.setattr(generation, "traffic_recorder", TrafficRecorder(None))
+    monkeypatch.setattr(generation, "llm_client", CapturingFakeClient())
+    monkeypatch.setattr(generation, "generation_cache", GenerationCache())
+    monkeypatch.setattr(GenerateScriptRequest, "model_dump", fail_model_dump)
+
+    response = TestClient(app).post(
+        "/api/v1/scripts/playwright-python",
+        json={
+            "page_url": "https://example.com/checkout",
+            "output_markdown": "## Page Feedback",
+            "annotations": [],
+        },
+    )
+
+    assert response.status_code == 200
+
+
+def test_cancelled_request_is_captured_with_client_closed_status(monkeypatch, tmp_path: Path):
+    from app.api.v1 import generation
+    from app.models.schemas import GenerateScriptRequest
+
+    class SlowClient(CapturingFakeClient):
+        async def generate_script(self, messages, model, temperature, timeout_seconds=None):
+            await asyncio.sleep(10)
+
+    path = tmp_path / "traffic.jsonl.gz"
+    recorder = TrafficRecorder(path)
+    monkeypatch.setattr(generation, "traffic_recorder", recorder)
+    monkeypatch.setattr(generation, "llm_client", SlowClient())
+    monkeypatch.setattr(generation, "generation_cache", GenerationCache())
+    request = GenerateScriptRequest(
+        page_url="https://example.com/checkout",
+        output_markdown="## Page Feedback",
+        annotations=[],
+    )
+
+    async def scenario():
+        task = asyncio.create_task(
+            generation.generate_playwright_python_script(
+                request, x_tenant_id="team-a", x_api_key=None, authorization=None
+            )
+        )
+        await asyncio.sleep(0.01)
+        task.cancel()
+        try:
+            await task
+        except asyncio.CancelledError:
+            pass
+
+    asyncio.run(scenario())
+    recorder.close()
+
+    entries = list(read_capture(path))
+    assert [entry["status"] for entry in entries] == [generation.CLIENT_CLOSED_REQUEST_STATUS]
@@ -1,17 +1,43 @@
-import React, { useCallback } from "react";
+import React, { useCallback, useEffect, useRef } from "react";
 import { Agentation, type Annotation } from "agentation";
 
-import { generatePlaywrightScript } from "./generation-client";
+import {
+  createDebouncedPrefetch,
+  generatePlaywrightScript,
+} from "./generation-client";
 import { saveScriptAsPythonFile } from "./script-download";
 import { RUNTIME_CONFIG } from "../shared/runtime-config";
 
 export function AgentationExtensionApp(): JSX.Element {
+  const prefetchRef = useRef(createDebouncedPrefetch());
+
+  useEffect(() => () => prefetchRef.current.cancel(), []);
+
+  // The toolbar reports the exact markdown onGenerateScript will send, including
+  // annotations restored from storage, so the prefetch lands on the same cache key.
+  const onOutputChange = useCallback(
+    (output: string, annotations: Annotation[]) => {
+      if (!output || annotations.length === 0) {
+        prefetchRef.current.cancel();
+        return;
+      }
+      prefetchRef.current.schedule({
+        pageUrl: window.location.href,
+        markdown: output,
+        annotations,
+      });
+    },
+    [],
+  );
+
   const onGenerateScript = useCallback(
     async (output: string, annotations: Annotation[]) => {
       if (annotations.length === 0) {
         return;
       }
 
+      prefetchRef.current.cancel();
+
       try {
         const result = await generatePlaywrightScript({
           pageUrl: window.location.href,
@@ -41,6 +67,7 @@ export function AgentationExtensionApp(): JSX.Element {
   return (
     <Agentation
       endpoint={RUNTIME_CONFIG.mcpEndpoint}
+      onOutputChange={onOutputChange}
       onGenerateScript={onGenerateScript}
     />
   );
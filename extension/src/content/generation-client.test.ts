@@ -2,8 +2,10 @@ import { afterEach, describe, expect, it, vi } from "vitest";
 
 import {
   buildGenerationRequestPayload,
+  createDebouncedPrefetch,
   extractScriptFromResponse,
   generatePlaywrightScript,
+  prefetchPlaywrightScript,
 } from "./generation-client";
 import type { RuntimeConfig } from "../shared/runtime-config";
 
@@ -97,3 +99,109 @@ describe("generatePlaywrightScript", () => {
     ).rejects.toThrow("timed out");
   });
 });
+
+describe("prefetchPlaywrightScript", () => {
+  afterEach(() => {
+    vi.restoreAllMocks();
+    vi.unstubAllGlobals();
+  });
+
+  it("posts the generation payload to the prefetch endpoint", async () => {
+    const fetchMock = vi.fn().mockResolvedValue({ ok: true } as Response);
+    vi.stubGlobal("fetch", fetchMock);
+
+    await prefetchPlaywrightScript({
+      pageUrl: "https://example.com",
+      markdown: "## output",
+      annotations: [
+        {
+          id: "1",
+          x: 10,
+          y: 20,
+          comment: "update CTA",
+          element: "Button",
+          elementPath: "body > button",
+          timestamp: 123,
+        },
+      ],
+    }, defaultRuntimeConfig);
+
+    expect(fetchMock).toHaveBeenCalledTimes(1);
+    const [url, fetchInit] = fetchMock.mock.calls[0];
+    expect(url).toBe(
+      "http://localhost:8000/api/v1/scripts/playwright-python/prefetch",
+    );
+    expect(JSON.parse(String(fetchInit.body)).page_url).toBe("https://example.com");
+  });
+
+  it("sends the same body as the generate call for the same toolbar output", async () => {
+    const fetchMock = vi.fn().mockResolvedValue({
+      ok: true,
+      json: async () => ({ script: "def test_x(page):\\n    pass" }),
+    } as Response);
+    vi.stubGlobal("fetch", fetchMock);
+    const input = {
+      pageUrl: "https://example.com/cart?step=2",
+      markdown: "## Page Feedback: /cart?step=2\n**Viewport:** 1280×720",
+      annotations: [
+        {
+          id: "1",
+          x: 10,
+          y: 20,
+          comment: "update CTA",
+          element: "Button",
+          elementPath: "body > button",
+          timestamp: 123,
+        },
+      ],
+    };
+
+    await prefetchPlaywrightScript(input, defaultRuntimeConfig);
+    await generatePlaywrightScript(input, defaultRuntimeConfig);
+
+    // The backend cache key is derived from the request body, so equal
+    // bodies mean the generate call can consume the prefetch.
+    const [prefetchCall, generateCall] = fetchMock.mock.calls;
+    expect(String(prefetchCall[1].body)).toBe(String(generateCall[1].body));
+  });
+
+  it("skips prefetch without annotations", async () => {
+    const fetchMock = vi.fn();
+    vi.stubGlobal("fetch", fetchMock);
+
+    await prefetchPlaywrightScript({
+      pageUrl: "https://example.com",
+      markdown: "",
+      annotations: [],
+    }, defaultRuntimeConfig);
+
+    expect(fetchMock).not.toHaveBeenCalled();
+  });
+});
+
+describe("createDebouncedPrefetch", () => {
+  afterEach(() => {
+    vi.useRealTimers();
+  });
+
+  it("only sends the latest input after the debounce delay", () => {
+    vi.useFakeTimers();
+    const prefetch = vi.fn().mockResolvedValue(undefined);
+    const debounced = createDebouncedPrefetch(1000, prefetch);
+
+    debounced.schedule({ pageUrl: "https://example.com", markdown: "a", annotations: [] });
+    vi.advanceTimersByTime(500);
+    debounced.schedule({ pageUrl: "https://example.com", markdown: "b", annotations: [] });
+    vi.advanceTimersByTime(999);
+    expect(prefetch).not.toHaveBeenCalled();
+
+    vi.advanceTimersByTime(1);
+    expect(prefetch).toHaveBeenCalledTimes(1);
+    expect(prefetch.mock.calls[0][0].markdown).toBe("b");
+
+    debounced.schedule({ pageUrl: "https://example.com", markdown: "c", annotations: [] });
+    debounced.cancel();
+    vi.advanceTimersByTime(1000);
+    expect(prefetch).toHaveBeenCalledTimes(1);
+  });
+});
@@ -36,6 +36,7 @@ export type GenerationResult = {
 
 const BACKEND_GENERATION_TIMEOUT_MS = 120_000;
 const GENERATION_TIMEOUT_MS = 130_000;
+const PREFETCH_DEBOUNCE_MS = 1_500;
 
 function normalizeBackendUrl(url: string): string {
   return url.replace(/\/$/, "");
@@ -136,3 +137,58 @@ export async function generatePlaywrightScript(
     },
   };
 }
+
+export async function prefetchPlaywrightScript(
+  input: GenerationInput,
+  runtimeConfig: RuntimeConfig = RUNTIME_CONFIG,
+): Promise<void> {
+  if (input.annotations.length === 0) {
+    return;
+  }
+
+  const payload = buildGenerationRequestPayload(input, runtimeConfig);
+  try {
+    await fetch(
+      `${normalizeBackendUrl(runtimeConfig.backendUrl)}/api/v1/scripts/playwright-python/prefetch`,
+      {
+        method: "POST",
+        headers: {
+          "Content-Type": "application/json",
+        },
+        body: JSON.stringify(payload),
+      },
+    );
+  } catch (error) {
+    console.debug("[Agentation Extension] Script prefetch failed:", error);
+  }
+}
+
+export type DebouncedPrefetch = {
+  schedule: (input: GenerationInput) => void;
+  cancel: () => void;
+};
+
+export function createDebouncedPrefetch(
+  delayMs: number = PREFETCH_DEBOUNCE_MS,
+  prefetch: (input: GenerationInput) => Promise<void> = prefetchPlaywrightScript,
+): DebouncedPrefetch {
+  let timer: ReturnType<typeof setTimeout> | undefined;
+
+  const cancel = () => {
+    if (timer !== undefined) {
+      clearTimeout(timer);
+      timer = undefined;
+    }
+  };
+
+  return {
+    schedule(input) {
+      cancel();
+      timer = setTimeout(() => {
+        timer = undefined;
+        void prefetch(input);
+      }, delayMs);
+    },
+    cancel,
+  };
+}
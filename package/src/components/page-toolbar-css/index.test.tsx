@@ -220,6 +220,58 @@ describe("PageFeedbackToolbarCSS", () => {
       expect(output).toContain("Cross path annotation in same domain");
     });
 
+    it("should report restored annotations through onOutputChange with the generate output", async () => {
+      localStorage.removeItem(getStorageKey(domainStoragePath()));
+      localStorage.setItem(
+        getStorageKey("/restored-page"),
+        JSON.stringify([
+          {
+            id: "restored-1",
+            x: 10,
+            y: 20,
+            comment: "Restored from storage",
+            element: "Button",
+            elementPath: "main > button",
+            timestamp: Date.now(),
+          },
+        ]),
+      );
+      window.history.pushState({}, "", "/restored-page?step=2");
+
+      const handleOutputChange = vi.fn();
+      const handleGenerate = vi.fn();
+      render(
+        <PageFeedbackToolbarCSS
+          onOutputChange={handleOutputChange}
+          onGenerateScript={handleGenerate}
+        />,
+      );
+
+      await waitFor(() => {
+        const [output, annotations] = handleOutputChange.mock.lastCall ?? [];
+        expect(output).toContain("Restored from storage");
+        expect(annotations?.map((a: Annotation) => a.id)).toContain("restored-1");
+      });
+
+      fireEvent.click(screen.getByTitle("Start feedback mode"));
+      await waitFor(() => {
+        const generateButton = document.querySelector(
+          'button[data-action=\"generate-script\"]',
+        ) as HTMLButtonElement | null;
+        expect(generateButton?.disabled).toBe(false);
+      });
+      fireEvent.click(
+        document.querySelector(
+          'button[data-action=\"generate-script\"]',
+        ) as HTMLButtonElement,
+      );
+
+      await waitFor(() => {
+        expect(handleGenerate).toHaveBeenCalledTimes(1);
+      });
+      expect(handleOutputChange.mock.lastCall).toEqual(handleGenerate.mock.calls[0]);
+    });
+
     it("should show success state and reset to idle after generation completes", async () => {
       const handleGenerate = vi.fn().mockResolvedValue(undefined);
       render(<PageFeedbackToolbarCSS onGenerateScript={handleGenerate} />);
@@ -648,6 +648,8 @@ export type PageFeedbackToolbarCSSProps = {
     output: string,
     annotations: Annotation[],
   ) => void | Promise<void>;
+  /** Callback fired whenever the output onGenerateScript would receive changes, including annotations restored from storage on mount. Receives the same markdown output and annotations. */
+  onOutputChange?: (output: string, annotations: Annotation[]) => void;
   /** Whether to copy to clipboard when the copy button is clicked. Defaults to true. */
   copyToClipboard?: boolean;
   /** Server URL for sync (e.g., "http://localhost:4747"). If not provided, uses localStorage only. */
@@ -678,6 +680,7 @@ export function PageFeedbackToolbarCSS({
   onCopy,
   onSubmit,
   onGenerateScript,
+  onOutputChange,
   copyToClipboard = true,
   endpoint,
   sessionId: initialSessionId,
@@ -2913,6 +2916,40 @@ export function PageFeedbackToolbarCSS({
     onSubmit,
   ]);
 
+  // Report the output generateScript would send (e.g. for prefetching)
+  useEffect(() => {
+    if (!onOutputChange) return;
+
+    const emitOutput = () => {
+      const displayUrl =
+        typeof window !== "undefined"
+          ? window.location.pathname +
+            window.location.search +
+            window.location.hash
+          : pathname;
+      onOutputChange(
+        generateOutput(
+          annotations,
+          displayUrl,
+          settings.outputDetail,
+          effectiveReactMode,
+        ),
+        annotations,
+      );
+    };
+
+    emitOutput();
+    // The output includes the viewport size
+    window.addEventListener("resize", emitOutput);
+    return () => window.removeEventListener("resize", emitOutput);
+  }, [
+    annotations,
+    pathname,
+    settings.outputDetail,
+    effectiveReactMode,
+    onOutputChange,
+  ]);
+
   // Send to webhook
   const sendToWebhook = useCallback(async () => {
     const displayUrl =